@@ -0,0 +1,57 @@
+"""
+    tankeroidz.archetypes
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Registry of game object archetypes and shared sprites. An archetype is a
+    subclass of a game object class that holds the data every object of that
+    type shares (e.g. a powerup type's stats from resources/powerups.ini) as
+    class attributes, so each instance only carries its own mutable state.
+    Sprites are compiled once, the first time they're needed, and shared by
+    every object that draws them.
+"""
+
+# Base class -> {archetype name: archetype class}
+_types = {}
+
+# Sprite key -> compiled surface
+_sprites = {}
+
+def define(base, name, attrs):
+    """Creates and registers an archetype.
+
+    Args:
+        base: The game object class the archetype extends.
+        name: The archetype's name; stored as the class attribute `name`.
+        attrs: Dict of shared attributes, set as class attributes.
+    Returns:
+        The archetype class.
+    """
+    attrs = dict(attrs, name=name)
+    cls = type(base.__name__ + '_' + name, (base,), attrs)
+    _types.setdefault(base, {})[name] = cls
+    return cls
+
+def get(base, name):
+    """Returns the archetype `name` of the class `base`.
+
+    Raises:
+        KeyError: If there's no such archetype.
+    """
+    return _types[base][name]
+
+def types(base):
+    """Returns every archetype of the class `base`, ordered by name."""
+    archetypes = _types.get(base, {})
+    return [archetypes[name] for name in sorted(archetypes)]
+
+def sprite(key, build, *args):
+    """Returns the shared sprite for `key`, calling `build(*args)` to compile
+    it the first time. Shared sprites must not be drawn on."""
+    surface = _sprites.get(key)
+    if surface is None:
+        surface = _sprites[key] = build(*args)
+    return surface
+
+def clear_sprites():
+    """Drops every compiled sprite, e.g. after the display mode changes."""
+    _sprites.clear()
@@ -0,0 +1,88 @@
+"""
+    tankeroidz.arena
+    ~~~~~~~~~~~~~~~~
+
+    Entity containers with deferred removal. Systems kill entities while
+    they iterate over them; the kills are applied once, at the end of the
+    tick, in a single compaction pass.
+"""
+import itertools
+
+class EntityArena(object):
+    """A list-like container of game objects with deferred kills.
+
+    EntityArena.kill only marks an entity as dead. Dead entities are
+    skipped by iteration right away, but stay in the arena, at their index,
+    until EntityArena.flush removes them. It's therefore safe to kill
+    entities in the middle of a loop over the arena, and a tick that kills
+    many entities costs one linear pass instead of a list.remove per kill.
+
+    Iteration order is the order that entities were appended in. The flush
+    compacts the survivors in place, keeping that order, rather than
+    swapping the last entity into each hole: the collision and drawing
+    order of entities (and with it the game's results) must not depend on
+    which entities died.
+    """
+    def __init__(self):
+        self._dense = [] # Entities, in order, including dead ones
+        self._alive = [] # Parallel to _dense
+        self._index_of = {} # id(entity) -> index in _dense
+        self._kills = 0
+
+    def append(self, obj):
+        """Adds a game object."""
+        self._index_of[id(obj)] = len(self._dense)
+        self._dense.append(obj)
+        self._alive.append(True)
+
+    def kill(self, obj):
+        """Marks an entity as dead; it's removed by the next flush. Returns
+        False if it's not alive in this arena."""
+        index = self._index_of.get(id(obj))
+        if index is None or not self._alive[index]:
+            return False
+
+        self._alive[index] = False
+        self._kills += 1
+        return True
+
+    def flush(self):
+        """Removes the dead entities in one pass, keeping the order of the
+        survivors. Returns the list of removed entities."""
+        if not self._kills:
+            return []
+
+        dense, alive, index_of = self._dense, self._alive, self._index_of
+        removed = []
+
+        j = 0
+        for i in xrange(len(dense)):
+            obj = dense[i]
+            if alive[i]:
+                dense[j] = obj
+                index_of[id(obj)] = j
+                j += 1
+            else:
+                removed.append(obj)
+                del index_of[id(obj)]
+
+        del dense[j:]
+        alive[:] = [True] * j
+        self._kills = 0
+
+        return removed
+
+    def __getitem__(self, index):
+        return self._dense[index]
+
+    def __contains__(self, obj):
+        index = self._index_of.get(id(obj))
+        return index is not None and self._alive[index]
+
+    def __iter__(self):
+        # compress reads both lists lazily, so entities killed or appended
+        # during the loop are skipped or visited respectively
+        return itertools.compress(self._dense, self._alive)
+
+    def __len__(self):
+        return len(self._dense) - self._kills
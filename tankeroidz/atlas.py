@@ -0,0 +1,95 @@
+"""
+    tankeroidz.atlas
+    ~~~~~~~~~~~~~~~~
+
+    Texture atlas build step. Packs the small images in the sprite, UI and
+    tank resource directories into a few large atlas pages and writes an
+    index of the sub-rectangle of every image. At runtime io_utils.get_image
+    returns subsurface views of the pages (see io_utils.load_atlas).
+
+    Usage (from the tankeroidz directory):
+        python atlas.py
+"""
+import os
+import pygame
+
+import io_utils
+
+ATLAS_DIRS = ('resources/sprites', 'resources/ui', 'resources/tanks')
+ATLAS_PATH = 'resources/atlas'
+INDEX_NAME = 'atlas.ini'
+
+def pack(sizes, page_size, padding=1):
+    """Packs rectangles into square pages with a simple shelf packer; the
+    tallest rectangles are placed first, left to right in rows (shelves).
+
+    Args:
+        sizes: A dict of name -> (width, height).
+        page_size: The width and height of each page in pixels.
+        padding: Empty pixels between rectangles.
+    Returns:
+        A dict of name -> (page, x, y, width, height).
+    Raises:
+        ValueError: If a rectangle is larger than a page.
+    """
+    placements = {}
+    page, x, y, shelf_height = 0, 0, 0, 0
+
+    order = sorted(sizes, key=lambda n: (-sizes[n][1], -sizes[n][0], n))
+    for name in order:
+        width, height = sizes[name]
+        if width > page_size or height > page_size:
+            raise ValueError("<< " + name + " >> doesn't fit on an atlas "
+                "page.")
+
+        if x + width > page_size: # Start a new shelf
+            x, y = 0, y + shelf_height + padding
+            shelf_height = 0
+        if y + height > page_size: # Start a new page
+            page, x, y, shelf_height = page + 1, 0, 0, 0
+
+        placements[name] = page, x, y, width, height
+        x += width + padding
+        shelf_height = max(shelf_height, height)
+
+    return placements
+
+def build_atlas(dirs=ATLAS_DIRS, out_dir=ATLAS_PATH, page_size=1024):
+    """Packs every PNG in `dirs` into atlas pages (`atlas0.png`, ...) and
+    writes the index `atlas.ini` to `out_dir`."""
+    images = {}
+    for d in dirs:
+        for path in io_utils.get_filenames_r(d, 'png'):
+            images[io_utils.file_name(path)] = pygame.image.load(path)
+
+    sizes = dict((name, img.get_size()) for name, img in images.iteritems())
+    placements = pack(sizes, page_size)
+
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+
+    page_count = max(p[0] for p in placements.itervalues()) + 1
+    pages = [pygame.Surface((page_size, page_size), pygame.SRCALPHA, 32)
+        for i in xrange(page_count)]
+
+    lines = ["; Generated by atlas.build_atlas(); do not edit."]
+    for name in sorted(placements):
+        page, x, y, width, height = placements[name]
+
+        # MAX blending onto the empty page copies the pixels untouched
+        pages[page].blit(images[name], (x, y),
+            special_flags=pygame.BLEND_RGBA_MAX)
+
+        lines.extend(["", "[" + name + "]", "page=" + str(page),
+            "x=" + str(x), "y=" + str(y),
+            "width=" + str(width), "height=" + str(height)])
+
+    for i, surface in enumerate(pages):
+        pygame.image.save(surface, os.path.join(out_dir, 'atlas%d.png' % i))
+
+    with open(os.path.join(out_dir, INDEX_NAME), 'w') as index_file:
+        index_file.write("\n".join(lines) + "\n")
+
+if __name__ == "__main__":
+    build_atlas()
+    io_utils.build_manifest()
@@ -0,0 +1,202 @@
+"""
+    tankeroidz.benchmark
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Scripted gameplay benchmarks. Builds PlayScreen scenarios directly, times
+    each game system and render path separately and compares the results to
+    a stored JSON baseline.
+
+    Usage (from the tankeroidz directory):
+        python benchmark.py --save baseline.json
+        python benchmark.py --baseline baseline.json
+"""
+import gc
+import sys
+import json
+import math
+import random
+import argparse
+import timeit
+
+import game
+import console
+import archetypes
+from entities import *
+from screens import PlayScreen
+
+# The timed stages, in the order they're run each repetition
+STAGES = ('bullet_system', 'movement_system', 'collision_system',
+    'status_system', 'render_running_rasters', 'render_running_vectors')
+
+def scatter_enemies(screen, count):
+    """Spawns `count` enemies at random positions and headings on the map."""
+    width = screen.game.settings.width
+    height = screen.game.settings.height
+
+    for i in xrange(count):
+        screen.spawn_enemy()
+
+        enemy = screen.enemies[-1]
+        enemy.x = random.uniform(1, width - 1)
+        enemy.y = random.uniform(1, height - 1)
+        enemy.rot = random.uniform(0, 360)
+
+def stream_bullets(screen, count):
+    """Fills the tank's line of fire with bullets and holds the fire button
+    down with the cooldown already expired."""
+    tank = screen.tank
+    for i in xrange(count):
+        screen.spawn_one_bullet()
+        bullet = screen.bullets[-1]
+        bullet.x = tank.gun_x - math.sin(math.radians(tank.rot)) * i*10
+        bullet.y = tank.gun_y - math.cos(math.radians(tank.rot)) * i*10
+
+    tank.bullet_fire_now = True
+    tank.bullet_last_shot_tick = -10**6
+
+def activate_powerups(screen):
+    """Applies every powerup type to the tank and drops one of each."""
+    for cls in archetypes.types(Powerup):
+        powerup = cls()
+        screen.apply_powerup(powerup)
+
+        powerup.x = random.uniform(0, screen.game.settings.width)
+        powerup.y = random.uniform(0, screen.game.settings.height)
+        screen.powerups.append(powerup)
+
+SCENARIOS = [
+    ('enemies_50', lambda s: scatter_enemies(s, 50)),
+    ('enemies_500', lambda s: scatter_enemies(s, 500)),
+    ('enemies_5000', lambda s: scatter_enemies(s, 5000)),
+    ('bullet_stream', lambda s: (scatter_enemies(s, 50),
+        stream_bullets(s, 40))),
+    ('all_powerups', lambda s: (scatter_enemies(s, 50),
+        activate_powerups(s)))
+]
+
+def build_scenario(bench_game, setup, seed=0):
+    """Builds a PlayScreen with an invulnerable tank and runs `setup` on it.
+    Returns a snapshot of the screen (see PlayScreen.snapshot)."""
+    random.seed(seed)
+
+    screen = PlayScreen(bench_game, tank='classic', difficulty='normal')
+    screen.tank.max_health = screen.tank.health = 10**9
+    screen.tank.damage_modifier = 0
+    screen.tank.x = bench_game.settings.width / 2
+    screen.tank.y = bench_game.settings.height / 2
+    screen.tank.speed, screen.tank.dir = 1, 1
+    setup(screen)
+
+    return screen.snapshot()
+
+def time_scenario(bench_game, snapshot, repeat, number=3, seed=0):
+    """Times each stage on the scenario. Every timed call gets a freshly
+    restored screen, since the systems change the world (a collision pass
+    alone kills most of it) and later calls would otherwise run on whatever
+    the earlier ones left. A repetition times `number` calls of each stage.
+    Returns a dict of stage name -> milliseconds per call in the fastest
+    repetition; like timeit, the minimum is the least skewed by the OS, and
+    the garbage collector is kept out of the timed calls."""
+    best = dict((stage, float('inf')) for stage in STAGES)
+    timer = timeit.default_timer
+
+    for i in xrange(repeat):
+        for stage in STAGES:
+            elapsed = 0.0
+            for j in xrange(number):
+                random.seed(seed + i)
+                screen = PlayScreen.from_snapshot(bench_game, snapshot)
+                bench_game.screen = screen
+                func = getattr(screen, stage)
+
+                gc.collect()
+                gc.disable()
+                try:
+                    start = timer()
+                    func()
+                    elapsed += timer() - start
+                finally:
+                    gc.enable()
+            best[stage] = min(best[stage], elapsed)
+
+    return dict((stage, best[stage] * 1000.0 / number) for stage in STAGES)
+
+def run(repeat=5, number=3, names=None):
+    """Runs the benchmark scenarios. Returns a dict of scenario name -> stage
+    timings (see time_scenario). Only errors are logged while it runs, so
+    console output doesn't end up in the timings."""
+    bench_game = game.Game(headless=True)
+    # The raster path is timed too
+    bench_game.settings = bench_game.settings.replace(render_images=True)
+
+    level = console.LEVEL
+    console.flush()
+    console.set_level(console.TYPE_ERROR)
+    try:
+        results = {}
+        for name, setup in SCENARIOS:
+            if names and name not in names:
+                continue
+
+            snapshot = build_scenario(bench_game, setup)
+            results[name] = time_scenario(bench_game, snapshot, repeat,
+                number)
+    finally:
+        console.set_level(level)
+
+    return results
+
+def compare(results, baseline, threshold):
+    """Prints each stage's change from the baseline. Returns the number of
+    stages that regressed by more than `threshold` percent."""
+    regressions = 0
+
+    for name in sorted(results):
+        print name
+        for stage in STAGES:
+            now = results[name][stage]
+            line = "    %-24s %9.3f ms" % (stage, now)
+
+            before = baseline.get(name, {}).get(stage)
+            if before:
+                delta = (now - before) / before * 100
+                line += "  %+7.1f%%" % delta
+                if delta > threshold:
+                    line += "  REGRESSION"
+                    regressions += 1
+            print line
+
+    return regressions
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Tankeroidz benchmarks")
+    parser.add_argument('--repeat', type=int, default=5,
+        help="repetitions per scenario (default: 5)")
+    parser.add_argument('--number', type=int, default=3,
+        help="calls of each stage per repetition (default: 3)")
+    parser.add_argument('--scenario', action='append', metavar='NAME',
+        help="only run the named scenario (may be repeated)")
+    parser.add_argument('--save', metavar='FILE',
+        help="write the results to a JSON baseline")
+    parser.add_argument('--baseline', metavar='FILE',
+        help="compare the results to a JSON baseline")
+    parser.add_argument('--threshold', type=float, default=10.0,
+        help="percent slowdown reported as a regression (default: 10)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = run(args.repeat, args.number, args.scenario)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.save:
+        with open(args.save, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=4, sort_keys=True)
+
+    sys.exit(1 if regressions else 0)
@@ -19,6 +19,8 @@ defaults = {
         'left': [K_a, K_LEFT],
         'down': [K_s, K_DOWN],
         'primary': [K_SPACE],
-        'secondary': [K_LSHIFT]  
+        'secondary': [K_LSHIFT],
+        'profiler': [K_F3],
+        'console': [K_F2]
     }
 }
\ No newline at end of file
@@ -0,0 +1,215 @@
+"""
+    tankeroidz.config.schema
+    ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Typed, frozen configuration. INI files are validated against a schema
+    and compiled into immutable objects with attribute access (e.g.
+    `settings.fps`). Compiled configs are pickled to CACHE_PATH and reused
+    until the source file's modification time changes.
+"""
+import os
+import pickle
+import collections
+
+import io_utils
+import console
+
+CACHE_PATH = 'config/compiled.cache'
+CACHE_VERSION = 1
+
+# Value types of schema fields. Each converts an INI value or raises
+# ValueError.
+
+def integer(value):
+    if type(value) is not int:
+        raise ValueError("must be an integer")
+    return value
+
+def number(value):
+    if type(value) not in (int, float):
+        raise ValueError("must be a number")
+    return value
+
+def flag(value):
+    if type(value) is bool:
+        return value
+    if value in (0, 1):
+        return bool(value)
+    if str(value).lower() in ('true', 'yes', 'on'):
+        return True
+    if str(value).lower() in ('false', 'no', 'off'):
+        return False
+    raise ValueError("must be 0 or 1")
+
+def text(value):
+    return str(value)
+
+# (name, type, default) of every field
+SETTINGS_SCHEMA = (
+    ('width', integer, 480),
+    ('height', integer, 320),
+    ('title', text, "Tankeroidz"),
+    ('fps', integer, 30),
+    ('difficulty', text, 'hard'),
+    ('powerup_chance', number, 20),
+    ('dev_mode', flag, True),
+    ('show_console', flag, False),
+    ('render_images', flag, True),
+    ('render_vectors', flag, False),
+    ('array_entities', flag, False),
+    ('prewarm_sprites', flag, False),
+    ('show_profiler', flag, False),
+    ('dirty_rects', flag, False),
+    ('dirty_rect_max_pct', number, 50),
+    ('pool_high_water', integer, 256),
+    ('log_level', integer, 0),
+    ('log_file', text, '')
+)
+
+PLAY_CONFIG_SCHEMA = (
+    ('tank_speed', number, 4),
+    ('tank_turnradius', number, 4),
+    ('tank_boost_pct', number, 150),
+    ('powerup_chance', number, 100),
+    ('wall_walking', integer, 0),
+    ('damage_mod_pct', number, 100),
+    ('enemy_speed_pct', number, 100)
+)
+
+class FrozenConfig(object):
+    """Mixin for the config classes made by config_class. Fields are read as
+    attributes; reading them by key (`config['fps']`, `config.get('fps')`)
+    is still supported for older code."""
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if type(key) in (int, slice): # tuple indexing
+            return tuple.__getitem__(self, key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def replace(self, **fields):
+        """Returns a copy of the config with the given fields changed."""
+        return self._replace(**fields)
+
+    def as_dict(self):
+        return dict(self._asdict())
+
+    @classmethod
+    def from_dict(cls, values, source='<dict>'):
+        """Validates a dict of values and creates a config from it. Missing
+        fields get their default value and unknown keys are ignored.
+
+        Raises:
+            ValueError: If a value has the wrong type.
+        """
+        fields = []
+        for name, type_, default in cls.SCHEMA:
+            value = values.get(name, default)
+            try:
+                fields.append(type_(value))
+            except ValueError, e:
+                raise ValueError(source + ": `" + name + "` " + str(e) +
+                    " (got " + repr(value) + ").")
+
+        for key in values:
+            if key not in cls._fields:
+                console.warn(source + ": unknown setting `" + key +
+                    "` ignored.")
+
+        return cls(*fields)
+
+def config_class(name, schema):
+    """Creates a frozen config class (a namedtuple) for the schema."""
+    base = collections.namedtuple(name, [field[0] for field in schema])
+    return type(name, (FrozenConfig, base), {'__slots__': (),
+        'SCHEMA': schema})
+
+Settings = config_class('Settings', SETTINGS_SCHEMA)
+PlayConfig = config_class('PlayConfig', PLAY_CONFIG_SCHEMA)
+
+def compile_play_config(cfg, source):
+    """Merges the [default] section into each difficulty's section. Returns a
+    dict of difficulty -> PlayConfig."""
+    defaults = cfg.get('default', {})
+
+    difficulties = {}
+    for section, values in cfg.iteritems():
+        if section != 'default' and type(values) is dict:
+            difficulties[section] = PlayConfig.from_dict(
+                dict(defaults, **values), source + " [" + section + "]")
+
+    return difficulties
+
+# (path, compiler name) -> (schema fingerprint, mtime, compiled config)
+_cache = None
+
+def _fingerprint(schema):
+    # Compiled configs are rebuilt when their schema changes
+    return tuple((name, type_.__name__, default)
+        for name, type_, default in schema)
+
+def _load_cache():
+    global _cache
+    if _cache is None:
+        _cache = {}
+        try:
+            with open(CACHE_PATH, 'rb') as cache_file:
+                version, entries = pickle.load(cache_file)
+            if version == CACHE_VERSION:
+                _cache = entries
+        except Exception: # Missing, stale or corrupt; it's rebuilt
+            pass
+    return _cache
+
+def _save_cache():
+    temp_path = CACHE_PATH + '.tmp'
+    try:
+        with open(temp_path, 'wb') as cache_file:
+            pickle.dump((CACHE_VERSION, _cache), cache_file, 2)
+        if os.path.exists(CACHE_PATH): # os.rename won't replace on Windows
+            os.remove(CACHE_PATH)
+        os.rename(temp_path, CACHE_PATH)
+    except (IOError, OSError):
+        console.warn("Couldn't write the config cache << " + CACHE_PATH +
+            " >>.")
+
+def compiled(path, compile_func, schema):
+    """Returns `compile_func(ini_dict, path)` for the INI file at `path`,
+    reusing the cached result while the file and `schema` are unchanged.
+
+    Raises:
+        IOError: If the file doesn't exist.
+        ValueError: If the file doesn't match its schema.
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        raise IOError("Config file << " + path + " >> not found.")
+
+    cache = _load_cache()
+    key = path, compile_func.__name__
+    fingerprint = _fingerprint(schema)
+
+    entry = cache.get(key)
+    if entry is not None and entry[:2] == (fingerprint, mtime):
+        return entry[2]
+
+    config = compile_func(io_utils.ini_to_dict(path), path)
+    cache[key] = fingerprint, mtime, config
+    _save_cache()
+
+    return config
+
+def load_settings(path='config/settings.ini'):
+    """Returns the game's Settings."""
+    return compiled(path, Settings.from_dict, SETTINGS_SCHEMA)
+
+def load_play_config(path='config/play_config.ini'):
+    """Returns a dict of difficulty -> PlayConfig."""
+    return compiled(path, compile_play_config, PLAY_CONFIG_SCHEMA)
@@ -2,20 +2,36 @@
     tankeroidz.console
     ~~~~~~~~~~~~~~~~~~
 
-    Logging implementation for Tankeroidz.
+    Logging implementation for Tankeroidz. Records are kept in a bounded
+    ring buffer and handed to the consoles in batches by a background
+    writer thread, so logging never blocks the game loop on I/O.
 """
 
+import os
 import time
 import pygame
 import sys
+import atexit
+import threading
+import Queue
+import collections
 
 CONSOLES = []
-RECORDS = []
+
+# The most recent records, oldest first
+RECORDS_CAPACITY = 1024
+RECORDS = collections.deque(maxlen=RECORDS_CAPACITY)
 
 TYPE_INFO = 0
 TYPE_WARNING = 1
 TYPE_ERROR = 2
 
+# Records below this level are dropped as soon as they're logged
+LEVEL = TYPE_INFO
+
+# The most records the writer hands to the consoles at once
+BATCH_SIZE = 256
+
 TITLE = {}
 TITLE[TYPE_INFO] = ""
 TITLE[TYPE_WARNING] = "WARNING: "
@@ -29,11 +45,15 @@ def log(message, err=None, level=TYPE_INFO):
         message : str
         err : exception
     """
+    if level < LEVEL: # Cheap enough for the game loop
+        return
+
     record = ConsoleRecord(message, level, err)
     RECORDS.append(record)
 
-    for console in CONSOLES:
-        console.log(record)
+    if _writer is None:
+        _start_writer()
+    _queue.put(record)
 
 def warn(message, err=None):
     """Create a console record for a warning.
@@ -55,16 +75,80 @@ def error(message, err=None):
     """
     log(message, err, TYPE_ERROR)
 
+def set_level(level):
+    """Drops records below `level` from now on."""
+    global LEVEL
+    LEVEL = level
+
+def flush():
+    """Blocks until every logged record has been handed to the consoles."""
+    if _writer is not None:
+        _queue.join()
+
+def close(timeout=5):
+    """Hands the logged records to the consoles and stops the writer thread,
+    waiting at most `timeout` seconds. Called when the game exits; logging
+    afterwards starts a new writer."""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+
+    if writer is not None and writer.is_alive():
+        _queue.put(None)
+        writer.join(timeout)
+
+_queue = Queue.Queue()
+_writer = None
+_writer_lock = threading.Lock()
+
+def _start_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            writer = threading.Thread(target=_write_loop,
+                name='console-writer')
+            writer.daemon = True
+            writer.start()
+            _writer = writer
+
+# Don't lose the last records, or leave the writer waiting, on exit
+atexit.register(close)
+
+def _write_loop():
+    stop = False
+    while not stop:
+        batch = [_queue.get()] # Wait for a record, or None to stop
+        while len(batch) < BATCH_SIZE:
+            try:
+                batch.append(_queue.get_nowait())
+            except Queue.Empty:
+                break
+
+        records = [record for record in batch if record is not None]
+        stop = len(records) < len(batch)
+
+        for console in list(CONSOLES):
+            try:
+                console.log_batch(records)
+            except Exception, e: # A broken console mustn't stop the others
+                sys.stderr.write("Console " + type(console).__name__ +
+                    " failed: " + str(e) + "\n")
+
+        for item in batch:
+            _queue.task_done()
+
 class ConsoleRecord(object):
-    """A record containing a message, level of importance, timestamp, and
-    exception (optional)."""
+    """A record containing a message, level of importance, timestamp (in
+    seconds since the epoch), and exception (optional)."""
     def __init__(self, message='', level=TYPE_INFO, err=None):
         self.message = message
         self.level = level
         self.err = err
-        self.timestamp = time.gmtime()
+        self.timestamp = time.time()
 
     def __str__(self):
+        if self.err is not None:
+            return TITLE[self.level] + self.message + " (" + str(self.err) + ")"
         return TITLE[self.level] + self.message
 
 class Console(object):
@@ -73,8 +157,13 @@ class Console(object):
     def __init__(self, recording_level=0):
         self.recording_level = recording_level
 
+    def log_batch(self, records):
+        """Logs records in order. Called from the console writer thread."""
+        for record in records:
+            self.log(record)
+
     def log(self, record):
-        if self.recording_level < record.level:
+        if record.level < self.recording_level:
             return
 
         if record.level == TYPE_INFO:
@@ -88,11 +177,11 @@ class Console(object):
         pass
 
     def info(self, record):
-        self.post(TITLE[TYPE_INFO] + str(record))
+        self.post(str(record))
     def warn(self, record):
-        self.post(TITLE[TYPE_WARNING] + str(record))
+        self.post(str(record))
     def error(self, record):
-        self.post(TITLE[TYPE_ERROR] + str(record))
+        self.post(str(record))
 
 class StdConsole(Console):
     """Standard terminal console."""
@@ -100,9 +189,16 @@ class StdConsole(Console):
         sys.stdout.write(message + "\n")
 
 class IOConsole(Console):
-    """Console that logs records to a .log file."""
-    def __init__(self, log_file=None):
-        Console.__init__(self)
+    """Console that logs records to a .log file. When the next line would
+    take the file past `max_bytes` it's rotated first: `game.log` is renamed
+    to `game.log.1`, `game.log.1` to `game.log.2` and so on, keeping
+    `backups` old files. A file only goes over `max_bytes` if a single line
+    is longer than that."""
+    def __init__(self, log_file=None, recording_level=0,
+            max_bytes=1024*1024, backups=3):
+        Console.__init__(self, recording_level)
+        self.max_bytes = max_bytes
+        self.backups = backups
 
         self._log_file = None
         self.log_file = log_file
@@ -113,14 +209,66 @@ class IOConsole(Console):
 
     @log_file.setter
     def log_file(self, log_file):
-        if log_file is not None:
-            self.log_file.close()
+        if self._log_file is not None:
+            self._log_file.close()
 
         if type(log_file) is str:
-            self._log_file = open(log_file, 'rw')
-        elif type(log_file) is file:
+            self._log_file = open(log_file, 'a')
+        elif type(log_file) is file or log_file is None:
             self._log_file = log_file
         else:
             raise TypeError("Must be str or file.")
 
+    def log_batch(self, records):
+        if self._log_file is None:
+            return
+
+        rotating = self.max_bytes > 0 and os.path.isfile(self._log_file.name)
+        size = os.fstat(self._log_file.fileno()).st_size if rotating else 0
+
+        lines = []
+        for record in records:
+            if record.level < self.recording_level:
+                continue
+
+            line = self.format(record)
+            if rotating and size and size + len(line) > self.max_bytes:
+                self._write(lines) # Fill this file, then start the next
+                self.rotate()
+                lines, size = [], 0
+            lines.append(line)
+            size += len(line)
+        self._write(lines)
+
+    def log(self, record):
+        self.log_batch([record])
+
+    def _write(self, lines):
+        if lines:
+            self._log_file.write(''.join(lines))
+            self._log_file.flush()
+
+    def format(self, record):
+        stamp = time.strftime('%Y-%m-%d %H:%M:%S',
+            time.localtime(record.timestamp))
+        return stamp + " " + str(record) + "\n"
+
+    def rotate(self):
+        """Moves the log file to the first backup, shifting the older
+        backups along, and starts a new log file."""
+        path = self._log_file.name
+        self._log_file.close()
+        for i in xrange(self.backups - 1, 0, -1):
+            if os.path.exists(path + '.' + str(i)):
+                if os.path.exists(path + '.' + str(i + 1)):
+                    os.remove(path + '.' + str(i + 1))
+                os.rename(path + '.' + str(i), path + '.' + str(i + 1))
+        if self.backups > 0:
+            if os.path.exists(path + '.1'):
+                os.remove(path + '.1')
+            os.rename(path, path + '.1')
+        else:
+            os.remove(path)
+        self._log_file = open(path, 'a')
+
 CONSOLES.append(StdConsole())
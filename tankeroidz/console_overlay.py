@@ -0,0 +1,93 @@
+"""
+    tankeroidz.console_overlay
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    A console that shows the most recent records over the game. Each line
+    is rendered once, and the scrollback is composited into one surface
+    that's only rebuilt when records arrive, so drawing the overlay costs a
+    single blit per frame.
+"""
+import threading
+import collections
+
+import pygame
+
+import ui
+import console
+
+class ConsoleOverlay(console.Console):
+    """Draws the last `lines` records with the 'console' font.
+
+    Records arrive on the console writer thread; they're only queued there,
+    and rendered on the next ConsoleOverlay.render.
+
+    Attributes:
+        pos: The top left corner of the overlay.
+        width: The overlay's width (px); longer lines are cut off.
+        height: The overlay's height (px), which fits `lines` lines.
+        colors: Dict of record level -> text color.
+    """
+    BACKGROUND = 0, 0, 0, 160
+
+    def __init__(self, lines=6, pos=(10, 200), width=460, font_size=12,
+            recording_level=console.TYPE_INFO):
+        console.Console.__init__(self, recording_level)
+        self.pos = pos
+        self.width = width
+        self.colors = {
+            console.TYPE_INFO: (255, 255, 255),
+            console.TYPE_WARNING: (255, 220, 96),
+            console.TYPE_ERROR: (255, 96, 96)
+        }
+        self.font = ui.get_font('console', font_size)
+        self.height = lines * self.font.get_linesize() + 4
+
+        # [text, level, rendered surface or None], oldest first
+        self._lines = collections.deque(maxlen=lines)
+        self._lock = threading.Lock()
+        self._version, self._rendered_version = 0, -1
+        self._surface = None
+
+        # Show what was logged before the overlay was opened
+        self.log_batch(list(console.RECORDS)[-lines:])
+
+    def log_batch(self, records):
+        lines = [[str(record), record.level, None] for record in records
+            if record.level >= self.recording_level]
+        if not lines:
+            return
+
+        with self._lock:
+            self._lines.extend(lines)
+            self._version += 1
+
+    def log(self, record):
+        self.log_batch([record])
+
+    def render(self, surface):
+        """Draws the overlay. Returns the list of rects drawn."""
+        if self._version != self._rendered_version:
+            self._composite()
+        return [surface.blit(self._surface, self.pos)]
+
+    def _composite(self):
+        with self._lock:
+            lines = list(self._lines)
+            self._rendered_version = self._version
+
+        line_height, height = self.font.get_linesize(), self.height
+
+        composite = self._surface
+        if composite is None:
+            composite = self._surface = pygame.Surface((self.width, height),
+                pygame.SRCALPHA)
+        composite.fill(ConsoleOverlay.BACKGROUND)
+
+        # Newest line at the bottom
+        y = height - 2 - len(lines) * line_height
+        for line in lines:
+            if line[2] is None: # Render each line only once
+                line[2] = self.font.render(line[0], 1,
+                    self.colors[line[1]])
+            composite.blit(line[2], (4, y))
+            y += line_height
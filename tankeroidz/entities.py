@@ -1,8 +1,12 @@
+import copy
 import math
+import collections
 import random
 import pygame
 import operator
 import io_utils
+import graphics
+import archetypes
 
 class Entity(object):
     def __init__(self):
@@ -46,11 +50,24 @@ class GameObject(Entity): # TODO convert ticks -> sec
         impact: Damage done in health points when this unit collides with
             another unit.
         age: The number of game ticks that this unit has been active.
+        modifiers: Ordered dict of source -> (stat, Modifier) of the buffs on
+            the unit's stats, applied in the order they were added.
+        base_stats: The unmodified values of the stats that have modifiers.
+            A modified stat's attribute holds its effective value.
 
         position: a tuple with the unit's x- and y-coordinates
         draw_pos: a read-only tuple with the unit's coords for drawing
     """
+    # Units without a sprite of their own are drawn as vectors
+    sprite = None
+    
     def __init__(self):
+        self.reset()
+        self.create_sprite()
+        
+    def reset(self):
+        """Sets the unit back to its defaults so that a dead unit can be
+        reused (see pool.Pool). Surfaces made by create_sprite are kept."""
         self.x, self.y = 0, 0
         self._radius = 1
         self._width, self._height = 1, 1
@@ -62,7 +79,6 @@ class GameObject(Entity): # TODO convert ticks -> sec
         self.move_speed = 1 # px / sec
 
         self.color = (0, 0, 0)
-        self.sprite = None
 
         self.auras = []
 
@@ -81,10 +97,29 @@ class GameObject(Entity): # TODO convert ticks -> sec
 
         self.age = 0 # ticks
 
-        self.modifiers = {}
-        self.mod_timers = {}
+        self.modifiers = collections.OrderedDict()
+        self.base_stats = {}
 
         self.create()
+        
+    def create_sprite(self):
+        """Creates the unit's surfaces. Called once per instance, unlike
+        create, which runs every time the unit is reset."""
+        pass
+
+    # Attributes that hold surfaces and are left out of GameObject.get_state
+    _transient = ('sprite', 'rotated')
+
+    def get_state(self):
+        """Returns a picklable copy of the unit's state, without sprites."""
+        state = dict(self.__dict__)
+        for key in self._transient:
+            state.pop(key, None)
+        return copy.deepcopy(state)
+
+    def set_state(self, state):
+        """Restores state returned by GameObject.get_state."""
+        self.__dict__.update(copy.deepcopy(state))
 
     def apply_damage(self, health):
         self.health -= health * self.damage_modifier
@@ -93,18 +128,45 @@ class GameObject(Entity): # TODO convert ticks -> sec
         return
 
     def get(self, name, default=''):
-        value = getattr(self, name)
-
-        if (value is None): #TODO
-            print "No!!!! property"
-            return
-
-        if (name in self.modifiers):
-            mod = self.modifiers[name]
-
-            value = mod.oper(value, mod.value)
-
-        return value
+        """Returns the effective value of a stat. Modified stats are kept up
+        to date as plain attributes, so this is the same as getattr."""
+        return getattr(self, name)
+        
+    def add_modifier(self, source, stat, modifier):
+        """Modifies a stat, stacking with the modifiers from other sources.
+        A modifier from the same source replaces the old one.
+        
+        Args:
+            source: A name for where the modifier came from, e.g. a powerup.
+            stat: The name of the modified attribute.
+            modifier: The Modifier to apply.
+        """
+        old = self.modifiers.pop(source, None)
+        if old is not None and old[0] != stat:
+            self._resolve_stat(old[0])
+            
+        if stat not in self.base_stats:
+            self.base_stats[stat] = getattr(self, stat)
+            
+        self.modifiers[source] = stat, modifier
+        self._resolve_stat(stat)
+        
+    def remove_modifier(self, source):
+        """Removes the modifier from `source`, if there is one."""
+        old = self.modifiers.pop(source, None)
+        if old is not None:
+            self._resolve_stat(old[0])
+            
+    def _resolve_stat(self, stat):
+        # Compile the stat's modifiers into its effective value
+        value, modified = self.base_stats[stat], False
+        for mod_stat, mod in self.modifiers.itervalues():
+            if mod_stat == stat:
+                value, modified = mod.oper(value, mod.value), True
+        
+        if not modified: # Back to the base value
+            del self.base_stats[stat]
+        setattr(self, stat, value)
 
     @property
     def radius(self):
@@ -152,12 +214,19 @@ class GameObject(Entity): # TODO convert ticks -> sec
 class Tank(GameObject):
     def __init__(self, model):
         GameObject.__init__(self)
+        self.model = model
         self.load_sprite(model)
         
     def load_sprite(self, model):
-        self.sprite = io_utils.get_image('tank_' + model).convert_alpha()
-        self.sprite = pygame.transform.scale(self.sprite, (27, 50))
-        self.sprite = pygame.transform.flip(self.sprite, 0, 1)
+        self.sprite = archetypes.sprite(('tank', model), Tank.build_sprite,
+            model)
+        
+    @staticmethod
+    def build_sprite(model):
+        """Scales and flips the model's image; see archetypes.sprite."""
+        sprite = io_utils.get_image('tank_' + model).convert_alpha()
+        sprite = pygame.transform.scale(sprite, (27, 50))
+        return pygame.transform.flip(sprite, 0, 1)
         
     def create(self):
         self.x, self.y = 150, 150
@@ -198,15 +267,18 @@ class Tank(GameObject):
         self.effects = {} # Visual effects, assume BLEND_RGB_MULT
     
     def apply_powerup(self, powerup):
-        key = powerup.modifies
-        value = powerup.value
+        name = powerup.name
         
-        # Add the modifier and its timer        
-        self.modifiers[key] = Modifier(value)
-        if powerup.duration > 0:
-            self.mod_timers[key] = powerup.duration
+        # Picking up the same type of powerup again replaces its modifier,
+        # different ones stack. Expiry is timed by the PlayScreen.
+        self.add_modifier(name, powerup.modifies, Modifier(powerup.value))
         if powerup.effect is not None:
-            self.effects[key] = powerup.effect
+            self.effects[name] = powerup.effect
+            
+    def expire_powerup(self, name):
+        """Removes the buff and effect of a powerup."""
+        self.remove_modifier(name)
+        self.effects.pop(name, None)
     
 class Enemy(GameObject):
     def create(self):
@@ -214,7 +286,25 @@ class Enemy(GameObject):
         self.color = (0, 0, 0)
         self.impact = 10
         
-        self.sprite = io_utils.get_image('enemy').copy().convert_alpha()
+        self.sprite = None
+        self.rotated = None
+        
+    def load_sprite(self):
+        """Sets the enemy's sprite to the enemy image scaled to its size and
+        rotated to its heading. Enemies never resize or turn, so this is
+        called once at spawn; the surfaces are shared by all enemies with the
+        same radius and (rounded) rotation."""
+        scaled = archetypes.sprite(('enemy', self.radius), Enemy.build_sprite,
+            self.width, self.height)
+        
+        self.rotated = graphics.enemy_rotations.get(self.radius, scaled,
+            self.rot)
+        self.sprite = self.rotated.surface
+        
+    @staticmethod
+    def build_sprite(width, height):
+        return pygame.transform.scale(io_utils.get_image('enemy'),
+            (width, height)).convert_alpha()
         
     def on_impact(self, unit=None):
         self.health = 0
@@ -228,11 +318,17 @@ class Bullet(GameObject):
         self.speed = 1
         self.move_speed = 10
         
-        self.sprite = io_utils.get_image('bullet_default').copy().convert_alpha()
-        self.sprite = pygame.transform.scale(self.sprite, (self.width, self.height))
-        
         self.color = (255, 0, 0)
         
+    def create_sprite(self):
+        self.sprite = archetypes.sprite(('bullet', self.radius),
+            Bullet.build_sprite, self.width, self.height)
+        
+    @staticmethod
+    def build_sprite(width, height):
+        sprite = io_utils.get_image('bullet_default').copy().convert_alpha()
+        return pygame.transform.scale(sprite, (width, height))
+        
     def on_impact(self, unit=None):
         self.health = 0
         if unit is not None:
@@ -250,6 +346,9 @@ class Modifier(object):
     value = 0
     
     def __init__(self, *args): #TODO
+        # The string the modifier was parsed from, e.g. '*1.5'
+        self.spec = args[0] if len(args) == 1 else None
+        
         if len(args) == 1:
             val = args[0]
             
@@ -276,26 +375,52 @@ class Modifier(object):
         else:
             raise ValueError
             
+    def __reduce__(self):
+        # The replacement operator is a lambda, so pickle the spec string
+        return Modifier, (() if self.spec is None else (self.spec,))
+            
     def __str__(self):
         return "Modifier(Operator: " + str(self._oper) + ", Value: " + str(self.value) + ")"
     
 class Powerup(GameObject):
+    """A pickup that buffs the tank. Each powerup type in powerups.ini is an
+    archetype of Powerup (see archetypes.define), so the buff is made of
+    class attributes shared by every powerup of that type.
+    
+    Attributes:
+        name: The powerup type.
+        duration: Seconds the buff lasts; 0 or less lasts forever.
+        modifies: The name of the tank attribute that's buffed.
+        value: The buff as a Modifier string, e.g. '*1.5'.
+        effect: RGB color multiplied into the tank's sprite, or None.
+    """
+    name = None
+    duration = 0
+    modifies = None
+    value = None
+    effect = None
+    
     def create(self):
         self.radius = 4
         self.speed = 0
         self.max_age = 0
-        self.modifies = None
-        self.value = None
-        self._effect = None
-    
-    @property
-    def effect(self):
-        return self._effect
-    @effect.setter
-    def effect(self, effect):
+        
+    def get_state(self):
+        state = GameObject.get_state(self)
+        state['name'] = self.name # The archetype, see PlayScreen.from_snapshot
+        return state
+        
+    def set_state(self, state):
+        state = dict(state)
+        state.pop('name', None)
+        GameObject.set_state(self, state)
+        
+    @staticmethod
+    def parse_effect(effect):
+        """Converts an 'r,g,b' string to a tuple of ints."""
         if type(effect) is str:
-            effect = [int(n) for n in effect.split(',')]
-        self._effect = effect
+            effect = tuple([int(n) for n in effect.split(',')])
+        return effect
 
 powerups = [
     {
@@ -346,16 +471,20 @@ powerups = {
 }
 
 powerups = io_utils.ini_to_dict('resources/powerups.ini')
+
+# Compile every powerup type into an archetype of Powerup
+for _name, _stats in powerups.iteritems():
+    archetypes.define(Powerup, _name, dict(_stats,
+        effect=Powerup.parse_effect(_stats.get('effect'))))
     
 class PowerupFactory(object):
     
     @staticmethod
-    def create_random():
-        powerup = Powerup()
-        powerup.name = random.choice(powerups.keys())
-        aura = powerups[powerup.name]
+    def create_random(pools=None):
+        """Creates a random powerup. If a dict of powerup archetype ->
+        pool.Pool is given, a dead powerup is reused."""
+        cls = archetypes.get(Powerup, random.choice(powerups.keys()))
         
-        for key in aura:
-            setattr(powerup, key, aura[key])
-
-        return powerup
\ No newline at end of file
+        if pools is None:
+            return cls()
+        return pools[cls].acquire()
\ No newline at end of file
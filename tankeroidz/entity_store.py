@@ -0,0 +1,249 @@
+"""
+    tankeroidz.entity_store
+    ~~~~~~~~~~~~~~~~~~~~~~~
+
+    Array-backed (structure of arrays) storage for large numbers of game
+    objects. Requires NumPy; if NumPy isn't installed `numpy` is None and the
+    PlayScreen keeps its entities in plain lists.
+"""
+import math
+import itertools
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class EntityStore(object):
+    """A list-like container that keeps the hot numeric attributes of its
+    game objects in NumPy columns so that movement, wall culling and distance
+    tests can be done in a single vectorized pass.
+
+    Appending a GameObject copies its column attributes into the arrays and
+    returns an EntityView. Iterating the store yields those views in order,
+    so code written for lists of GameObjects keeps working.
+
+    Like arena.EntityArena, views can be killed during a loop and removed
+    at the end of the tick by EntityStore.flush. Killed views are skipped
+    by iteration but keep their rows (and count towards len) until then.
+
+    Attributes:
+        COLUMNS: Names of the attributes that are stored as columns.
+    """
+    COLUMNS = ('x', 'y', 'rot', 'move_speed', 'radius', 'health')
+
+    def __init__(self, capacity=64):
+        if numpy is None:
+            raise ImportError("EntityStore requires NumPy.")
+
+        self._n = 0
+        self._views = []
+        self._alive = [] # Parallel to _views; see EntityStore.kill
+        self._kills = 0
+        self._cols = {}
+        for name in self.COLUMNS:
+            self._cols[name] = numpy.zeros(capacity)
+
+    def column(self, name):
+        """Returns the live slice of the named column. Writes to the returned
+        array are writes to the entities."""
+        return self._cols[name][:self._n]
+
+    def append(self, obj):
+        """Copy a game object into the store and return its view."""
+        n = self._n
+        if n == len(self._cols['x']):
+            self._grow()
+
+        for name, col in self._cols.iteritems():
+            col[n] = getattr(obj, name)
+
+        view = EntityView(self, n, obj)
+        self._views.append(view)
+        self._alive.append(True)
+        self._n += 1
+
+        return view
+
+    def remove(self, view):
+        """Remove a single view, keeping the order of the other entities."""
+        if view._store is not self:
+            raise ValueError("EntityStore.remove(x): x not in store")
+
+        i, n = view._index, self._n
+        self._detach(view)
+
+        for col in self._cols.itervalues():
+            col[i:n-1] = col[i+1:n]
+
+        del self._views[i]
+        if not self._alive.pop(i):
+            self._kills -= 1
+        for j in xrange(i, n-1):
+            self._views[j]._index = j
+        self._n -= 1
+
+    def remove_where(self, mask):
+        """Remove every entity whose entry in the boolean mask is True in one
+        compaction pass, keeping the order of the survivors. Returns the list
+        of removed views."""
+        if not mask.any():
+            return []
+
+        keep = ~mask
+        n, k = self._n, int(keep.sum())
+
+        removed = [self._views[i] for i in numpy.flatnonzero(mask)]
+        for view in removed:
+            self._detach(view)
+
+        for col in self._cols.itervalues():
+            col[:k] = col[:n][keep]
+
+        self._views = [v for v, alive in zip(self._views, keep) if alive]
+        self._alive[:] = [a for a, alive in zip(self._alive, keep) if alive]
+        self._kills = self._alive.count(False)
+        for j, view in enumerate(self._views):
+            view._index = j
+        self._n = k
+
+        return removed
+
+    def kill(self, view):
+        """Marks a view as dead; it's removed by the next flush. Returns
+        False if it's not alive in this store."""
+        if view._store is not self or not self._alive[view._index]:
+            return False
+
+        self._alive[view._index] = False
+        self._kills += 1
+        return True
+
+    def kill_where(self, mask):
+        """Kills every live entity whose entry in the boolean mask is True;
+        see EntityStore.kill. Returns the number of entities killed."""
+        alive, kills = self._alive, 0
+        for i in numpy.flatnonzero(mask):
+            if alive[i]:
+                alive[i] = False
+                kills += 1
+        self._kills += kills
+        return kills
+
+    def alive(self):
+        """Returns a boolean mask of the entities that haven't been killed."""
+        return numpy.array(self._alive, dtype=bool)
+
+    def flush(self):
+        """Removes the killed views in one compaction pass. Returns the list
+        of removed views."""
+        if not self._kills:
+            return []
+        return self.remove_where(~self.alive())
+
+    def move(self):
+        """Move every entity forward by its move_speed along its rotation."""
+        n = self._n
+        rads = numpy.radians(self._cols['rot'][:n])
+        speed = self._cols['move_speed'][:n]
+
+        self._cols['x'][:n] -= numpy.sin(rads) * speed
+        self._cols['y'][:n] -= numpy.cos(rads) * speed
+
+    def outside(self, width, height, inclusive=True):
+        """Returns a boolean mask of the entities that are outside of the
+        map. If `inclusive` is False, entities sitting exactly on the map's
+        border are also considered outside."""
+        x, y = self.column('x'), self.column('y')
+
+        if inclusive:
+            return (x < 0) | (x > width) | (y < 0) | (y > height)
+        return (x <= 0) | (x >= width) | (y <= 0) | (y >= height)
+
+    def _grow(self):
+        for name, col in self._cols.items():
+            grown = numpy.zeros(len(col) * 2)
+            grown[:len(col)] = col
+            self._cols[name] = grown
+
+    def _detach(self, view):
+        # Write the columns back so the removed view is still consistent
+        for name, col in self._cols.iteritems():
+            value = col[view._index].item()
+            if name == 'radius':
+                view.obj.radius = value
+            else:
+                setattr(view.obj, name, value)
+        view._store = None
+
+    def __getitem__(self, index):
+        return self._views[index]
+
+    def __contains__(self, view):
+        return (getattr(view, '_store', None) is self and
+            self._alive[view._index])
+
+    def __iter__(self):
+        return itertools.compress(self._views, self._alive)
+
+    def __len__(self):
+        return self._n
+
+def _column_property(name):
+    def fget(self):
+        store = self._store
+        if store is None:
+            return getattr(self.obj, name)
+        return store._cols[name][self._index]
+
+    def fset(self, value):
+        store = self._store
+        if store is None:
+            setattr(self.obj, name, value)
+        else:
+            store._cols[name][self._index] = value
+
+    return property(fget, fset)
+
+class EntityView(object):
+    """A thin view of one entity in an EntityStore. Column attributes are
+    read from and written to the store's arrays; every other attribute (the
+    sprite, color, impact, age, etc.) is forwarded to the wrapped game
+    object. Once removed from its store the view reads the object directly.
+
+    Attributes:
+        obj: The GameObject that this view wraps.
+    """
+    __slots__ = ('_store', '_index', 'obj')
+
+    def __init__(self, store, index, obj):
+        object.__setattr__(self, '_store', store)
+        object.__setattr__(self, '_index', index)
+        object.__setattr__(self, 'obj', obj)
+
+    def __getattr__(self, name):
+        return getattr(self.obj, name)
+
+    def __setattr__(self, name, value):
+        if name in _VIEW_ATTRS:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.obj, name, value)
+
+    @property
+    def radius(self):
+        if self._store is None:
+            return self.obj.radius
+        return self._store._cols['radius'][self._index]
+    @radius.setter
+    def radius(self, value):
+        # Keep the object's width/height in sync; they're used for drawing
+        self.obj.radius = value
+        if self._store is not None:
+            self._store._cols['radius'][self._index] = value
+
+for _name in EntityStore.COLUMNS:
+    if _name != 'radius':
+        setattr(EntityView, _name, _column_property(_name))
+
+_VIEW_ATTRS = frozenset(EntityView.__slots__ + EntityStore.COLUMNS)
@@ -18,40 +18,91 @@ from console import *
 import console
 import config
 import io_utils
+import run_history
+
+from config import schema
 
 class Game:
-    """The game application; loads the game and manages the main loop."""
+    """The game application; loads the game and manages the main loop.
+    
+    Attributes:
+        headless: If True, the game runs without a window (using SDL's dummy
+            video driver), never renders and isn't throttled to the fps.
+        throttle: If False, the main loop runs as fast as possible.
+        persist_scores: If False, finished runs aren't written to disk.
+        run_history: The run_history.RunHistory that finished runs are
+            recorded in, or None if sqlite3 isn't available.
+        recorder: A replay.Recorder that records the session, or None.
+        player: A replay.Player that feeds recorded input, or None.
+    """
 
-    def __init__(self):
+    def __init__(self, headless=False):
+        self.headless = headless
+        self.throttle = not headless
+        self.persist_scores = not headless
+        self.ticks = 0
+        
+        self.recorder = None
+        self.player = None
+        
+        if headless: # Must be set before the display is initialized
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            
         pygame.init()
 
         self.load()
         
         self.timer = pygame.time.Clock()
         
-        # Must set logo before setting display mode
-        logo = pygame.image.load('resources/logo32.png')
-        pygame.display.set_icon(logo)
+        if headless:
+            # Nothing is drawn, so don't transform sprites for drawing either
+            self.settings = self.settings.replace(render_images=False)
+        else:
+            # Must set logo before setting display mode
+            logo = pygame.image.load('resources/logo32.png')
+            pygame.display.set_icon(logo)
+            
+            pygame.display.set_caption(self.settings.title)
         
-        pygame.display.set_caption(self.settings['title'])
-        self.frame = pygame.display.set_mode((self.settings['width'],
-            self.settings['height']))
+        # A display surface is still needed headless for Surface.convert_alpha
+        self.frame = pygame.display.set_mode((self.settings.width,
+            self.settings.height))
 
         self.preload_images()
+        
+        # Opened now, in the background, so the game over screen never waits
+        # for it
+        self.run_history = None
+        if self.persist_scores and run_history.sqlite3 is not None:
+            self.run_history = run_history.get_history()
   
     def load(self):
         """Load settings and keybindings."""
         self.load_settings()
         self.load_keybindings()
+        self.configure_logging()
             
     def load_settings(self):
         try:
-            self.settings = io_utils.ini_to_dict("config/settings.ini")
+            self.settings = schema.load_settings()
         except IOError:
-            self.settings = config.defaults['settings']
+            self.settings = schema.Settings.from_dict(
+                config.defaults['settings'], "config.defaults")
             console.warn("Failed to load game settings. Defaults loaded from " 
                 "config.py.")
             
+    def configure_logging(self):
+        """Applies the log level and opens the log file, if one is set."""
+        console.set_level(self.settings.log_level)
+        
+        if self.settings.log_file and not any(
+                isinstance(c, IOConsole) for c in console.CONSOLES):
+            try:
+                console.CONSOLES.append(IOConsole(self.settings.log_file))
+            except IOError, e:
+                console.warn("Couldn't open the log file << " +
+                    self.settings.log_file + " >>.", e)
+            
     def load_keybindings(self):
         try:
             kb = io_utils.ini_to_dict("config/keybinds.ini")
@@ -78,22 +129,47 @@ class Game:
         self.keybindings = kb
     
     def preload_images(self):
-        """Loads all png images in the './resources' directory and caches them
-        by their file name. Assumes no two files have the same name."""
-        images = io_utils.get_filenames_r('resources', 'png')
+        """Loads the asset manifest, which lists all png images in the
+        './resources' directory by their file name. Images are loaded when
+        they're first used; only the fallback image is loaded now. Assumes no
+        two files have the same name."""
+        try:
+            io_utils.load_manifest()
+        except IOError:
+            console.warn("Asset manifest not found; rebuilding it.")
+            io_utils.build_manifest()
+            io_utils.load_manifest()
         
-        for img_name in images:
-            img = pygame.image.load(img_name).convert_alpha()
-            img.set_colorkey((255, 0, 255)) # ugly purple is transparent
-            
-            io_utils.cache_image(io_utils.file_name(img_name), img)
+        try:
+            io_utils.load_atlas()
+        except IOError:
+            console.log("No texture atlas found; images load individually.")
+        
+        io_utils.get_image(io_utils.DEFAULT_IMG)
+        
+    def start(self, seek_tick=None):
+        """Prepare the game to start and begin the game loop.
         
-    def start(self):
-        """Prepare the game to start and begin the game loop."""
+        Args:
+            seek_tick: When playing back a replay, fast forward to this tick
+                before starting the loop.
+        """
         #self.screen = None
         self.set_screen(TitleScreen(self))
         self.ticks = 0
-        self.run()
+        
+        if self.recorder is not None:
+            self.recorder.start()
+        if self.player is not None:
+            self.player.start()
+            if seek_tick is not None:
+                self.player.seek(self, seek_tick, PlayScreen.from_snapshot)
+        
+        try:
+            self.run()
+        finally:
+            if self.recorder is not None:
+                self.recorder.save()
     
     def run(self):
         """The game's main loop. The game processes input, runs its update
@@ -102,15 +178,60 @@ class Game:
         while (True):
             self.process_input()
             self.update()
-            self.render()
-            self.timer.tick(self.settings['fps'])
+            
+            if not self.headless:
+                self.render()
+            if self.throttle:
+                self.timer.tick(self.settings.fps)
+                
+    def simulate(self, ticks=None, until_game_over=False):
+        """Runs the game logic as fast as possible without rendering, e.g.
+        for balancing or regression runs on machines without a display.
+        
+        Args:
+            ticks: The maximum number of ticks to run. None for no limit.
+            until_game_over: Stop once the game switches to the game over
+                screen.
+        Returns:
+            int: The number of ticks that were run.
+        Raises:
+            ValueError: If neither stop condition is given.
+        """
+        if ticks is None and not until_game_over:
+            raise ValueError("Game.simulate(): A tick count or "
+                "`until_game_over` is required.")
+        
+        start = self.ticks
+        while ticks is None or self.ticks - start < ticks:
+            self.process_input()
+            self.update()
+            
+            if until_game_over and isinstance(self.screen, GameOverScreen):
+                break
+        
+        return self.ticks - start
     
     def process_input(self):
         """Process events and input such as keypresses, mouse button presses,
         and PyGame Events."""
-        for event in pygame.event.get():
+        if self.player is not None:
+            events = self.player.events_for(self.ticks)
+            
+            # Recorded input only, but the window can still be closed
+            events.extend(e for e in pygame.event.get() if e.type == QUIT)
+            
+            if self.player.finished:
+                console.log("Replay finished.")
+                self.player = None
+        else:
+            events = pygame.event.get()
+        
+        for event in events:
+            if self.recorder is not None:
+                self.recorder.record(self.ticks, event)
+                
             if event.type == QUIT:
-                console.log("Thanks for playing " + self.settings['title'] + "!")
+                console.log("Thanks for playing " + self.settings.title + "!")
                 pygame.quit()
                 sys.exit()
             elif event.type == KEYDOWN:
@@ -123,12 +244,21 @@ class Game:
         """Run the current screen's update logic."""
         self.screen.update()
         self.ticks += 1
+        
+        recorder = self.recorder
+        if (recorder is not None and
+                self.ticks % recorder.keyframe_interval == 0):
+            recorder.keyframe(self)
     
     def render(self):
         """Render the current screen to the PyGame surface and update the
         display."""
-        self.screen.render()
-        pygame.display.flip()
+        dirty_rects = self.screen.render()
+        
+        if dirty_rects is None:
+            pygame.display.flip()
+        else: # Only part of the frame changed
+            pygame.display.update(dirty_rects)
     
     def set_screen(self, screen):
         """Sets the game's current screen, which represents its state."""
@@ -1,4 +1,6 @@
+import math
 import pygame
+import collections
 
 class Graphics(object):
     def __init__(self, surface):
@@ -69,4 +71,85 @@ class Drawable(object):
         
     @property
     def point(self):
-        return self.x, self.y
\ No newline at end of file
+        return self.x, self.y
+
+class RotatedSprite(object):
+    """A pre-rotated sprite along with its bounding rect and the offset (in
+    pixels) from the owner's position to the sprite's center.
+
+    Attributes:
+        surface: The rotated PyGame Surface.
+        rect: The surface's rect, positioned at the origin.
+        offset: (x, y) offset added to the owner's position to get the center.
+    """
+    def __init__(self, surface, offset=(0, 0)):
+        self.surface = surface
+        self.rect = surface.get_rect()
+        self.offset = offset
+
+    def bounds_at(self, x, y):
+        """Returns the rect to blit the sprite at for an owner at (x, y)."""
+        bounds = self.rect.copy()
+        bounds.center = x + self.offset[0], y + self.offset[1]
+        return bounds
+
+class RotationCache(object):
+    """A bounded LRU cache of rotated sprites keyed by a name (e.g. the tank
+    model) and the rotation quantized to `step` degrees.
+
+    Attributes:
+        max_size: The number of rotated sprites kept before the least recently
+            used one is evicted.
+        step: The rotation quantum in degrees.
+    """
+    def __init__(self, max_size=720, step=1):
+        self.max_size = max_size
+        self.step = step
+        self._entries = collections.OrderedDict()
+
+    def quantize(self, angle):
+        """Rounds the angle to the cache's step and wraps it to [0, 360)."""
+        return (int(round(angle / float(self.step))) * self.step) % 360
+
+    def get(self, key, surface, angle, offset=0):
+        """Returns the RotatedSprite for `surface` rotated by `angle` degrees,
+        rotating and caching it if needed.
+
+        Args:
+            key: Name that identifies `surface` in the cache.
+            surface: The unrotated sprite.
+            angle: Rotation in degrees (counterclockwise).
+            offset: Distance the sprite's center is pushed behind its owner's
+                position along the rotation, e.g. for a tank's turret.
+        """
+        angle = self.quantize(angle)
+        cache_key = key, angle
+
+        entry = self._entries.pop(cache_key, None)
+        if entry is None:
+            rads = math.radians(angle)
+            entry = RotatedSprite(pygame.transform.rotate(surface, angle),
+                (-math.sin(rads) * offset, -math.cos(rads) * offset))
+
+            while len(self._entries) >= self.max_size:
+                self._entries.popitem(last=False)
+
+        self._entries[cache_key] = entry # (re)insert as most recently used
+        return entry
+
+    def prewarm(self, key, surface, offset=0):
+        """Rotate and cache `surface` at every quantized angle."""
+        for angle in xrange(0, 360, self.step):
+            self.get(key, surface, angle, offset)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+# Rotated tank sprites, shared between games
+tank_rotations = RotationCache()
+
+# Scaled and rotated enemy sprites keyed by radius (4-11 px)
+enemy_rotations = RotationCache(max_size=8*360)
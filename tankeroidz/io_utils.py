@@ -1,36 +1,214 @@
 import os
+import re
+import copy
+import bisect
+import struct
 import collections
 
-image_cache = {}
+import pygame
+
+# Loaded surfaces, least recently used first
+image_cache = collections.OrderedDict()
 DEFAULT_IMG = "img_not_found"
 
-def cache_image(name, image):
+# Images that are never evicted from the cache
+pinned_images = set([DEFAULT_IMG])
+
+# Evict least recently used images once the cache holds this many bytes
+cache_limit = 32 * 1024 * 1024
+cache_bytes = 0
+
+# Parsed INI files: path -> ((mtime, size), dict), see ini_to_dict
+_ini_cache = {}
+
+INT_PATTERN = re.compile(r'^-?\d+$')
+FLOAT_PATTERN = re.compile(r'^-?(\d+\.\d*|\.\d+)$')
+
+MANIFEST_PATH = 'resources/manifest.ini'
+
+# Image name -> dict with path, width, height and tags (see build_manifest)
+manifest = {}
+_manifest_names = [] # sorted, for prefix queries
+_manifest_tags = {} # tag -> list of image names
+
+ATLAS_INDEX_PATH = 'resources/atlas/atlas.ini'
+
+# Image name -> (page, x, y, width, height) (see atlas.build_atlas)
+atlas_index = {}
+_atlas_pages = {} # page number -> loaded page surface
+
+def _surface_bytes(image):
+    if image.get_parent() is not None: # Subsurfaces share their parent's pixels
+        return 0
+    return image.get_pitch() * image.get_height()
+
+def cache_image(name, image, pinned=False):
     """Stores the specified name-image pair in the cache dictionary.
     
     Args:
         name: The name for the new cache record.
         image: The image (PyGame Surface) to store.
+        pinned: If True, the image is never evicted.
     """
+    global cache_bytes
+    
+    if name in image_cache:
+        cache_bytes -= _surface_bytes(image_cache.pop(name))
+    if pinned:
+        pinned_images.add(name)
+        
     image_cache[name] = image
+    cache_bytes += _surface_bytes(image)
+    
+    # Evict least recently used images until the cache fits its limit
+    for old_name in list(image_cache):
+        if cache_bytes <= cache_limit:
+            break
+        if old_name != name and old_name not in pinned_images:
+            cache_bytes -= _surface_bytes(image_cache.pop(old_name))
 
+def load_image(path):
+    """Loads and converts an image file for drawing. Magenta (255, 0, 255)
+    pixels are made transparent."""
+    image = pygame.image.load(path).convert_alpha()
+    image.set_colorkey((255, 0, 255)) # ugly purple is transparent
+    return image
     
 def get_image(name): #TODO
-    """Gets the specified cached image or returns the default image if there is
-    no cache record with the given name.
+    """Gets the specified image, loading it on first use if it's listed in
+    the asset manifest. Returns the default image if there's no image with
+    the given name.
     
     Args:
         name: The name of the cached image to retrieve.
     Returns:
         pygame.Surface: Cached image object.
     """
-    if name in image_cache:
-        return image_cache[name]
-    elif DEFAULT_IMG in image_cache:
-        return image_cache[DEFAULT_IMG]
+    image = image_cache.pop(name, None)
+    if image is not None:
+        image_cache[name] = image # Mark as most recently used
+        return image
+    elif name in atlas_index:
+        page, x, y, width, height = atlas_index[name]
+        image = _atlas_page(page).subsurface((x, y, width, height))
+        cache_image(name, image)
+        return image
+    elif name in manifest:
+        image = load_image(manifest[name]['path'])
+        cache_image(name, image)
+        return image
+    elif name != DEFAULT_IMG and has_image(DEFAULT_IMG):
+        return get_image(DEFAULT_IMG)
     else:
         raise KeyError("The image << " + name + " >> is not in the cache and "
             "the fallback image cannot be found.")
 
+def has_image(name):
+    """Returns True if the named image is cached, in the atlas or listed in
+    the manifest."""
+    return name in image_cache or name in atlas_index or name in manifest
+
+def _atlas_page(page):
+    surface = _atlas_pages.get(page)
+    if surface is None:
+        page_path = os.path.join(os.path.dirname(ATLAS_INDEX_PATH),
+            'atlas%d.png' % page)
+        surface = _atlas_pages[page] = load_image(page_path)
+    return surface
+
+def load_atlas(path=ATLAS_INDEX_PATH):
+    """Loads the texture atlas index. Images in the atlas are then returned
+    by get_image as subsurfaces of the (lazily loaded) atlas pages.
+    
+    Raises:
+        IOError: If the index can't be read.
+    """
+    global ATLAS_INDEX_PATH
+    
+    index = ini_to_dict(path)
+    ATLAS_INDEX_PATH = path
+    
+    atlas_index.clear()
+    _atlas_pages.clear()
+    for name, entry in index.iteritems():
+        atlas_index[name] = (entry['page'], entry['x'], entry['y'],
+            entry['width'], entry['height'])
+
+def find_images(prefix=None, tag=None):
+    """Returns the sorted names of all known images that start with `prefix`
+    and/or have the tag `tag`, using the manifest's indices.
+    
+    Args:
+        prefix (optional): Image name prefix, e.g. "tank_".
+        tag (optional): Manifest tag, e.g. "tanks".
+    """
+    names = _manifest_names
+    if prefix is not None:
+        start = bisect.bisect_left(names, prefix)
+        end = start
+        while end < len(names) and names[end].startswith(prefix):
+            end += 1
+        names = names[start:end]
+    if tag is not None:
+        tagged = set(_manifest_tags.get(tag, []))
+        names = [name for name in names if name in tagged]
+    return list(names)
+
+def png_size(path):
+    """Reads the (width, height) of a PNG file from its header."""
+    with open(path, 'rb') as png:
+        header = png.read(24)
+    if header[:8] != '\x89PNG\r\n\x1a\n':
+        raise IOError("<< " + path + " >> is not a PNG file.")
+    return struct.unpack('>II', header[16:24])
+
+def build_manifest(root='resources', path=MANIFEST_PATH):
+    """Writes the asset manifest: an INI file with a section for each PNG in
+    `root` that records its path, size and tags. An image is tagged with the
+    directories it's in (below `root`) and its name's prefix, e.g.
+    `resources/tanks/tank_T34.png` is tagged `tanks` and `tank`.
+    """
+    lines = ["; Generated by io_utils.build_manifest(); do not edit."]
+    
+    for img_path in sorted(get_filenames_r(root, 'png')):
+        name = file_name(img_path)
+        rel_dir = os.path.relpath(os.path.dirname(img_path), root)
+        
+        tags = [d for d in rel_dir.split(os.sep) if d != '.']
+        if '_' in name:
+            tags.append(name.split('_')[0])
+        
+        width, height = png_size(img_path)
+        lines.extend(["", "[" + name + "]",
+            "path=" + img_path.replace(os.sep, '/'),
+            "width=" + str(width),
+            "height=" + str(height),
+            "tags=" + ",".join(tags)])
+    
+    with open(path, 'w') as manifest_file:
+        manifest_file.write("\n".join(lines) + "\n")
+
+def load_manifest(path=MANIFEST_PATH):
+    """Loads the asset manifest and indexes it by name and tag. Images are
+    then loaded by get_image on first use.
+    
+    Raises:
+        IOError: If the manifest can't be read.
+    """
+    global _manifest_names
+    
+    manifest.clear()
+    _manifest_tags.clear()
+    
+    for name, entry in ini_to_dict(path).iteritems():
+        entry['tags'] = [t for t in str(entry.get('tags', '')).split(',') if t]
+        manifest[name] = entry
+        
+        for tag in entry['tags']:
+            _manifest_tags.setdefault(tag, []).append(name)
+            
+    _manifest_names = sorted(manifest)
+
             
 def file_name(file_path):
     """Trims a file's path into just its name and returns it.
@@ -75,7 +253,11 @@ def get_filenames_r(dir, ext=None):
 
 
 def ini_to_dict(f):
-    """Creates a dictionary from the specified INI file.
+    """Creates a dictionary from the specified INI file. Integer and decimal
+    values are cast to ints and floats.
+    
+    A file given by name is only parsed again once it changes; every call
+    returns its own copy of the dictionary.
 
     Args:
         file_name (str): The path to the desired INI file.
@@ -84,15 +266,28 @@ def ini_to_dict(f):
     Raises:
         TypeError, IOError
     """
-    
-    """NOTE: floats aren't supported for dynamic casting"""
-    
     if type(f) is str:
-        ini_file = open(f, 'r')
+        try:
+            stat = os.stat(f)
+            stamp = stat.st_mtime, stat.st_size
+        except OSError:
+            stamp = None # open() raises the IOError
+        
+        cached = _ini_cache.get(f)
+        if stamp is not None and cached is not None and cached[0] == stamp:
+            return copy.deepcopy(cached[1])
+        
+        root_dict = _parse_ini(open(f, 'r'))
+        if stamp is not None:
+            _ini_cache[f] = stamp, copy.deepcopy(root_dict)
+        return root_dict
     elif not isinstance(f, file):
         raise TypeError("ini_to_dict() requires a file name (string) or file "
             "object as an argument.")
     
+    return _parse_ini(f)
+
+def _parse_ini(ini_file):
     root_dict = collections.OrderedDict()
     fill_dict = root_dict # current dict being filled by the parser
     
@@ -126,9 +321,11 @@ def ini_to_dict(f):
             key = key.strip()
             value = value.strip()
             
-            # Dynamic str -> int casting. Floats not supported in this impl!!
-            if value.isdigit():
+            # Dynamic str -> int/float casting
+            if INT_PATTERN.match(value):
                 value = int(value)
+            elif FLOAT_PATTERN.match(value):
+                value = float(value)
             
             fill_dict[key] = value
             
@@ -140,4 +337,7 @@ def ini_to_dict(f):
         
     ini_file.close()
     
-    return root_dict
\ No newline at end of file
+    return root_dict
+
+if __name__ == "__main__":
+    build_manifest()
@@ -13,9 +13,48 @@
 
 import os
 import sys
+import argparse
 
 import game
+import replay
+import console
+from screens import PlayScreen
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Tankeroidz")
+    parser.add_argument('--headless', action='store_true',
+        help="simulate a game without a window or frame rate limit")
+    parser.add_argument('--ticks', type=int, default=None,
+        help="number of ticks to simulate (default: until game over)")
+    parser.add_argument('--tank', default='classic',
+        help="tank model for a headless game")
+    parser.add_argument('--difficulty', default='normal',
+        help="difficulty for a headless game")
+    parser.add_argument('--record', metavar='FILE',
+        help="record the session's input to a replay file")
+    parser.add_argument('--replay', metavar='FILE',
+        help="play back a replay file")
+    parser.add_argument('--fast', action='store_true',
+        help="play back the replay as fast as possible")
+    parser.add_argument('--seek', type=int, default=None, metavar='TICK',
+        help="start the replay playback at this tick")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    tankeroidz = game.Game()
-    tankeroidz.start()
\ No newline at end of file
+    args = parse_args()
+    tankeroidz = game.Game(headless=args.headless)
+    
+    if args.replay:
+        tankeroidz.player = replay.Player(args.replay)
+        tankeroidz.persist_scores = False
+        tankeroidz.throttle = not (args.fast or args.headless)
+        tankeroidz.start(args.seek)
+    elif args.headless:
+        tankeroidz.set_screen(PlayScreen(tankeroidz, tank=args.tank,
+            difficulty=args.difficulty))
+        ticks = tankeroidz.simulate(args.ticks, args.ticks is None)
+        console.log("Simulated " + str(ticks) + " ticks.")
+    else:
+        if args.record:
+            tankeroidz.recorder = replay.Recorder(args.record)
+        tankeroidz.start()
\ No newline at end of file
@@ -29,6 +29,6 @@ def point_in_rect(point, rect):
         hasattr(rect, 'width') and hasattr(rect, 'height')):
         rx, ry, rw, rh = rect.x, rect.y, rect.width, rect.height
     elif isinstance(rect, (list, tuple)):
-        rx, ry, rw, rh = point[:4]
+        rx, ry, rw, rh = rect[:4]
         
-    return (rw <= px <= rx+rw) and (ry <= py <= ry+rh)
\ No newline at end of file
+    return (rx <= px <= rx+rw) and (ry <= py <= ry+rh)
\ No newline at end of file
@@ -0,0 +1,46 @@
+"""
+    tankeroidz.pool
+    ~~~~~~~~~~~~~~~
+
+    Object pools for short-lived game objects. Bullets, enemies and powerups
+    are created and destroyed many times a second; pooling them reuses dead
+    instances (and the surfaces they own) instead of building new ones.
+"""
+
+class Pool(object):
+    """A free list of dead game objects of one class.
+
+    Released objects are kept until they're acquired again, at which point
+    they're reset with GameObject.reset. Objects released while the pool
+    already holds `high_water` objects are dropped and left to the garbage
+    collector, so a burst of deaths doesn't pin memory forever.
+
+    Attributes:
+        factory: Callable that creates a new object when the pool is empty.
+        high_water: The most free objects the pool keeps.
+    """
+    def __init__(self, factory, high_water=256):
+        self.factory = factory
+        self.high_water = high_water
+        self._free = []
+
+    def acquire(self):
+        """Returns a reset object from the pool or a new one if it's empty."""
+        if not self._free:
+            return self.factory()
+
+        obj = self._free.pop()
+        obj.reset()
+        return obj
+
+    def release(self, obj):
+        """Returns a dead object to the pool. The caller must not use it
+        afterwards."""
+        if len(self._free) < self.high_water:
+            self._free.append(obj)
+
+    def clear(self):
+        self._free = []
+
+    def __len__(self):
+        return len(self._free)
@@ -0,0 +1,105 @@
+"""
+    tankeroidz.profiler
+    ~~~~~~~~~~~~~~~~~~~
+
+    Lightweight per-stage timing for the game loop. Contains the Profiler,
+    which keeps a fixed-size ring buffer of samples for every stage, and
+    ProfilerOverlay, which draws the rolling numbers on top of the game.
+"""
+import timeit
+
+import ui
+
+timer = timeit.default_timer
+
+class StageSamples(object):
+    """A ring buffer holding the last `size` timings (in seconds) of a stage.
+    """
+    def __init__(self, size):
+        self.samples = [0.0] * size
+        self.count = 0
+        self.index = 0
+
+    def add(self, seconds):
+        self.samples[self.index] = seconds
+        self.index = (self.index + 1) % len(self.samples)
+        if self.count < len(self.samples):
+            self.count += 1
+
+    def stats(self):
+        """Returns (mean, p95, max) of the buffered samples in seconds."""
+        if not self.count:
+            return 0.0, 0.0, 0.0
+
+        samples = sorted(self.samples[:self.count])
+        p95 = samples[min(self.count - 1, int(self.count * 0.95))]
+        return sum(samples) / self.count, p95, samples[-1]
+
+class Profiler(object):
+    """Times named stages of the game loop.
+
+    Callers time a stage with `Profiler.call(name, func)`. When nothing
+    should be measured, callers hold None instead of a Profiler and call the
+    stage directly, so disabled profiling costs nothing.
+
+    Attributes:
+        size: The number of samples kept per stage.
+        stages: Ordered names of the stages seen so far.
+    """
+    def __init__(self, size=120):
+        self.size = size
+        self.stages = []
+        self._samples = {}
+
+    def call(self, name, func, *args):
+        """Calls `func(*args)`, recording how long it took under `name`."""
+        start = timer()
+        result = func(*args)
+        self.add(name, timer() - start)
+        return result
+
+    def add(self, name, seconds):
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples[name] = StageSamples(self.size)
+            self.stages.append(name)
+        samples.add(seconds)
+
+    def stats(self, name):
+        """Returns (mean, p95, max) of the named stage in seconds."""
+        return self._samples[name].stats()
+
+    def report(self):
+        """Returns a list of (name, mean, p95, max) tuples, in seconds, for
+        every stage in the order they were first seen."""
+        return [(name,) + self._samples[name].stats() for name in self.stages]
+
+    def reset(self):
+        self.stages = []
+        self._samples = {}
+
+class ProfilerOverlay(object):
+    """Draws a Profiler's report with the 'console' font."""
+    def __init__(self, profiler, pos=(10, 45), color=(255, 255, 255),
+            font_size=12):
+        self.profiler = profiler
+        self.pos = pos
+        self.color = color
+        self.font = ui.get_font('console', font_size)
+
+    def render(self, surface):
+        """Draws the report. Returns the list of rects drawn."""
+        x, y = self.pos
+        rects = []
+        line_height = self.font.get_linesize()
+        lines = ["%-20s %6s %6s %6s" % ('stage (ms)', 'mean', 'p95', 'max')]
+
+        for name, mean, p95, max_ in self.profiler.report():
+            lines.append("%-20s %6.2f %6.2f %6.2f" % (name, mean*1000,
+                p95*1000, max_*1000))
+
+        for line in lines:
+            rects.append(surface.blit(self.font.render(line, 1, self.color),
+                (x, y)))
+            y += line_height
+        return rects
@@ -0,0 +1,194 @@
+"""
+    tankeroidz.replay
+    ~~~~~~~~~~~~~~~~~
+
+    Deterministic input recording and playback. A replay stores the seed of
+    the `random` module and every event that reached Game.process_input
+    tagged with its tick, plus periodic keyframes of the game's state that
+    are used to seek without playing back from the start.
+"""
+import bisect
+import pickle
+import random
+import struct
+import zlib
+
+import pygame
+
+MAGIC = 'TKRP'
+VERSION = 5 # 5: keyframes hold the run's kill and powerup counts
+
+# magic, version, seed, keyframe interval
+HEADER = struct.Struct('<4sHII')
+
+# tick, type, field flags, key, mod, button, x, y
+EVENT = struct.Struct('<IHBiHBhh')
+
+# Flags for the optional event fields stored in each record
+FIELD_KEY = 1
+FIELD_MOD = 2
+FIELD_BUTTON = 4
+FIELD_POS = 8
+
+def pack_event(tick, event):
+    """Packs a PyGame event into a fixed-width binary record."""
+    flags, key, mod, button, x, y = 0, 0, 0, 0, 0, 0
+
+    if hasattr(event, 'key'):
+        flags |= FIELD_KEY
+        key = event.key
+    if hasattr(event, 'mod'):
+        flags |= FIELD_MOD
+        mod = event.mod
+    if hasattr(event, 'button'):
+        flags |= FIELD_BUTTON
+        button = event.button
+    if hasattr(event, 'pos'):
+        flags |= FIELD_POS
+        x, y = event.pos
+
+    return EVENT.pack(tick, event.type, flags, key, mod, button, x, y)
+
+def unpack_event(record):
+    """Returns a (tick, PyGame event) pair from a packed event record."""
+    tick, type_, flags, key, mod, button, x, y = EVENT.unpack(record)
+
+    attrs = {}
+    if flags & FIELD_KEY: attrs['key'] = key
+    if flags & FIELD_MOD: attrs['mod'] = mod
+    if flags & FIELD_BUTTON: attrs['button'] = button
+    if flags & FIELD_POS: attrs['pos'] = x, y
+
+    return tick, pygame.event.Event(type_, attrs)
+
+class Keyframe(object):
+    """The state of the game at the start of a tick.
+
+    Attributes:
+        tick: The game tick the keyframe was taken at.
+        random_state: The state of the `random` module.
+        snapshot: The current screen's snapshot (see PlayScreen.snapshot) or
+            None if the screen doesn't support snapshots.
+    """
+    def __init__(self, tick, random_state, snapshot=None):
+        self.tick = tick
+        self.random_state = random_state
+        self.snapshot = snapshot
+
+class Recorder(object):
+    """Records the events of a game session to a replay file.
+
+    Attributes:
+        path: The replay file that Recorder.save writes to.
+        seed: The seed of the `random` module.
+        keyframe_interval: Number of ticks between keyframes.
+    """
+    def __init__(self, path, seed=None, keyframe_interval=300):
+        self.path = path
+        self.seed = random.randint(0, 2**32 - 1) if seed is None else seed
+        self.keyframe_interval = keyframe_interval
+
+        self._events = []
+        self.keyframes = []
+
+    def start(self):
+        """Seed the `random` module; call when the session starts."""
+        random.seed(self.seed)
+
+    def record(self, tick, event):
+        self._events.append(pack_event(tick, event))
+
+    def keyframe(self, game):
+        """Stores a keyframe of the game at its current tick."""
+        snapshot = None
+        if hasattr(game.screen, 'snapshot'):
+            snapshot = game.screen.snapshot()
+
+        self.keyframes.append(Keyframe(game.ticks, random.getstate(),
+            snapshot))
+
+    def save(self, path=None):
+        """Writes the replay file."""
+        body = pickle.dumps((''.join(self._events), self.keyframes), 2)
+
+        with open(path or self.path, 'wb') as replay_file:
+            replay_file.write(HEADER.pack(MAGIC, VERSION, self.seed,
+                self.keyframe_interval))
+            replay_file.write(zlib.compress(body))
+
+class Player(object):
+    """Plays back a replay file recorded by Recorder.
+
+    Attributes:
+        seed: The seed of the `random` module for the session.
+        keyframes: Keyframes of the session, ordered by tick.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as replay_file:
+            data = replay_file.read()
+
+        magic, version, self.seed, self.keyframe_interval = \
+            HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise IOError("<< " + path + " >> is not a supported replay file.")
+
+        events, self.keyframes = pickle.loads(
+            zlib.decompress(data[HEADER.size:]))
+
+        self._events = [unpack_event(events[i:i+EVENT.size])
+            for i in xrange(0, len(events), EVENT.size)]
+        self._ticks = [tick for tick, event in self._events]
+        self._next = 0
+
+    def start(self):
+        """Prepare to play the session back from its first tick."""
+        random.seed(self.seed)
+        self._next = 0
+
+    @property
+    def finished(self):
+        return self._next >= len(self._events)
+
+    def events_for(self, tick):
+        """Returns the recorded events for the given tick. Ticks must be
+        requested in increasing order (use Player.seek to jump)."""
+        events = []
+        while (self._next < len(self._events) and
+                self._events[self._next][0] <= tick):
+            events.append(self._events[self._next][1])
+            self._next += 1
+
+        return events
+
+    def seek(self, game, tick, screen_factory):
+        """Bring the game to the start of the given tick, restoring the
+        closest keyframe at or before it and then simulating the remaining
+        ticks as fast as possible.
+
+        Args:
+            game: The Game being played back.
+            tick: The tick to seek to.
+            screen_factory: Callable that takes the game and a keyframe
+                snapshot and returns the restored screen.
+        """
+        keyframe = None
+        for kf in self.keyframes:
+            if kf.tick > tick:
+                break
+            if kf.snapshot is not None:
+                keyframe = kf
+
+        # Restore the keyframe unless simulating from the current tick is
+        # closer to the target
+        if keyframe is not None and not keyframe.tick <= game.ticks <= tick:
+            game.set_screen(screen_factory(game, keyframe.snapshot))
+            game.ticks = keyframe.tick
+            random.setstate(keyframe.random_state)
+        elif game.ticks > tick:
+            raise ValueError("Replay has no keyframe before tick " +
+                str(tick) + ".")
+
+        self._next = bisect.bisect_left(self._ticks, game.ticks)
+        while game.ticks < tick:
+            game.process_input()
+            game.update()
@@ -0,0 +1,298 @@
+"""
+    tankeroidz.run_history
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    SQLite database of finished runs. The database is opened, written (in
+    batched transactions) and queried on a background thread, so neither
+    saving a run nor reading the stats ever stalls a frame. Queries for
+    the game over screen are served by indexes and a per-difficulty
+    summary table. Requires Python's sqlite3 module; if it isn't available
+    `sqlite3` is None and runs aren't kept.
+"""
+import time
+import atexit
+import threading
+import Queue
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+import console
+
+DB_PATH = 'config/runs.db'
+
+# The most runs written in one transaction
+BATCH_SIZE = 64
+
+# Columns of a run, in the order they're stored
+RUN_FIELDS = ('difficulty', 'tank', 'ticks', 'kills', 'powerups', 'score')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    finished REAL NOT NULL,
+    difficulty TEXT NOT NULL,
+    tank TEXT NOT NULL,
+    ticks INTEGER NOT NULL,
+    kills INTEGER NOT NULL,
+    powerups INTEGER NOT NULL,
+    score INTEGER NOT NULL
+);
+-- Top-N and percentile queries, overall and per difficulty or tank
+CREATE INDEX IF NOT EXISTS runs_score ON runs (score);
+CREATE INDEX IF NOT EXISTS runs_difficulty_score ON runs (difficulty, score);
+CREATE INDEX IF NOT EXISTS runs_tank_score ON runs (tank, score);
+
+-- Aggregates per difficulty, kept up to date by every write
+CREATE TABLE IF NOT EXISTS run_stats (
+    difficulty TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    min INTEGER NOT NULL,
+    max INTEGER NOT NULL
+);
+"""
+
+class RunStats(object):
+    """Aggregates of a set of runs' scores.
+
+    Attributes:
+        count: The number of runs.
+        total: The sum of their scores.
+        min: The lowest score, or None if there are no runs.
+        max: The highest score, or None if there are no runs.
+    """
+    def __init__(self, count=0, total=0, min=None, max=None):
+        self.count = count
+        self.total = total
+        self.min = min
+        self.max = max
+
+    @property
+    def avg(self):
+        return self.total / float(self.count) if self.count else None
+
+class Query(object):
+    """The pending result of a RunHistory query, which runs on the history's
+    thread. Poll Query.ready (e.g. once a tick) or block with Query.wait.
+
+    Attributes:
+        value: The query's result once it's ready; None if it failed.
+    """
+    def __init__(self):
+        self.value = None
+        self._done = threading.Event()
+
+    @property
+    def ready(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Blocks until the result is ready and returns it."""
+        self._done.wait(timeout)
+        return self.value
+
+    def _resolve(self, value):
+        self.value = value
+        self._done.set()
+
+class RunHistory(object):
+    """The run database. It's opened, written and queried by a thread of
+    its own, so nothing the game calls touches the disk: RunHistory.record
+    queues a run and the query methods return a Query. Queued runs and
+    queries are handled in order, so a query sees every run recorded before
+    it.
+
+    Attributes:
+        path: The path of the database.
+    """
+    def __init__(self, path=DB_PATH):
+        if sqlite3 is None:
+            raise ImportError("RunHistory requires sqlite3.")
+
+        self.path = path
+        self._queue = Queue.Queue()
+        self._thread = threading.Thread(target=self._run,
+            name='run-history')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def record(self, **run):
+        """Queues a finished run to be written. Takes the RUN_FIELDS as
+        keyword arguments; returns right away."""
+        row = (time.time(),) + tuple(run[f] for f in RUN_FIELDS)
+        self._queue.put(('run', row))
+
+    def flush(self):
+        """Blocks until every queued run and query has been handled."""
+        self._queue.join()
+
+    def close(self):
+        """Writes the queued runs and stops the history's thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def stats(self, difficulty):
+        """Queries the RunStats of every run on a difficulty."""
+        return self._query(self._stats, difficulty)
+
+    def top(self, n=10, difficulty=None, tank=None):
+        """Queries the `n` best runs, best first, as dicts of RUN_FIELDS.
+        Optionally only the runs on one difficulty or with one tank."""
+        return self._query(self._top, n, difficulty, tank)
+
+    def count_below(self, score, difficulty=None, tank=None):
+        """Queries the number of runs that scored less than `score`."""
+        return self._query(self._count_below, score, difficulty, tank)
+
+    def percentile(self, score, difficulty=None, tank=None):
+        """Queries the percentage of runs that scored less than `score`; None
+        if there are no runs."""
+        return self._query(self._percentile, score, difficulty, tank)
+
+    def summary(self, difficulty, score):
+        """Queries a (RunStats, runs scoring less than `score`) pair for a
+        difficulty, e.g. for the game over screen."""
+        return self._query(self._summary, difficulty, score)
+
+    def _query(self, func, *args):
+        query = Query()
+        self._queue.put(('query', func, args, query))
+        return query
+
+    # The queries themselves, run on the history's thread
+
+    def _stats(self, conn, difficulty):
+        row = conn.execute("SELECT count, total, min, max FROM run_stats"
+            " WHERE difficulty = ?", (difficulty,)).fetchone()
+        return RunStats(*row) if row else RunStats()
+
+    def _top(self, conn, n, difficulty, tank):
+        where, args = self._filter(difficulty, tank)
+        rows = conn.execute("SELECT " + ', '.join(RUN_FIELDS) +
+            " FROM runs" + where + " ORDER BY score DESC LIMIT ?",
+            args + (n,))
+        return [dict(zip(RUN_FIELDS, row)) for row in rows]
+
+    def _count_below(self, conn, score, difficulty, tank):
+        where, args = self._filter(difficulty, tank)
+        where += (" AND" if where else " WHERE") + " score < ?"
+        return conn.execute("SELECT COUNT(*) FROM runs" + where,
+            args + (score,)).fetchone()[0]
+
+    def _percentile(self, conn, score, difficulty, tank):
+        where, args = self._filter(difficulty, tank)
+        count = conn.execute("SELECT COUNT(*) FROM runs" + where,
+            args).fetchone()[0]
+        if not count:
+            return None
+        return 100.0 * self._count_below(conn, score, difficulty, tank) / count
+
+    def _summary(self, conn, difficulty, score):
+        return (self._stats(conn, difficulty),
+            self._count_below(conn, score, difficulty, None))
+
+    def _filter(self, difficulty, tank):
+        clauses, args = [], ()
+        if difficulty is not None:
+            clauses.append("difficulty = ?")
+            args += (difficulty,)
+        if tank is not None:
+            clauses.append("tank = ?")
+            args += (tank,)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), args
+
+    def _connect(self):
+        try:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        except sqlite3.Error, e:
+            console.error("Failed to open the run history << " + self.path +
+                " >>.", e)
+            return None
+        return conn
+
+    def _run(self):
+        conn, stop = None, False
+
+        while not stop:
+            batch = [self._queue.get()] # Wait for a run or query
+            if conn is None: # Opened once there's something to do
+                conn = self._connect() # Runs and queries fail if it's None
+            while len(batch) < BATCH_SIZE: # Take whatever else is queued
+                try:
+                    batch.append(self._queue.get_nowait())
+                except Queue.Empty:
+                    break
+
+            # Write runs in one transaction up to each query, so queries see
+            # the runs queued before them
+            runs = []
+            for item in batch:
+                if item is None:
+                    stop = True
+                elif item[0] == 'run':
+                    runs.append(item[1])
+                else:
+                    self._write(conn, runs)
+                    runs = []
+                    self._answer(conn, *item[1:])
+            self._write(conn, runs)
+
+            for i in xrange(len(batch)):
+                self._queue.task_done()
+
+        if conn is not None:
+            conn.close()
+
+    def _answer(self, conn, func, args, query):
+        value = None
+        if conn is not None:
+            try:
+                value = func(conn, *args)
+            except sqlite3.Error, e:
+                console.error("Run history query failed.", e)
+        query._resolve(value)
+
+    def _write(self, conn, runs):
+        if not runs or conn is None:
+            return
+
+        try:
+            with conn: # One transaction per batch
+                conn.executemany("INSERT INTO runs (finished, " +
+                    ', '.join(RUN_FIELDS) + ") VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    runs)
+
+                for run in runs:
+                    difficulty, score = run[1], run[-1]
+                    conn.execute("INSERT OR IGNORE INTO run_stats VALUES "
+                        "(?, 0, 0, ?, ?)", (difficulty, score, score))
+                    conn.execute("UPDATE run_stats SET count = count + 1, "
+                        "total = total + ?, min = MIN(min, ?), "
+                        "max = MAX(max, ?) WHERE difficulty = ?",
+                        (score, score, score, difficulty))
+        except sqlite3.Error, e:
+            console.error("Failed to save " + str(len(runs)) +
+                " run(s) to << " + self.path + " >>.", e)
+
+# Path -> the shared RunHistory of that database
+_histories = {}
+
+def get_history(path=DB_PATH):
+    """Returns the shared RunHistory of the database at `path`, starting it
+    the first time. The database is opened on the history's thread (errors
+    are logged there) and its queued runs are written when the game exits.
+
+    Raises:
+        ImportError: If sqlite3 isn't available.
+    """
+    history = _histories.get(path)
+    if history is None:
+        history = _histories[path] = RunHistory(path)
+        atexit.register(history.close)
+    return history
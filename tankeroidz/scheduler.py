@@ -0,0 +1,120 @@
+"""
+    tankeroidz.scheduler
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Tick-based timers. Timers are kept in a heap ordered by the tick they're
+    due, so advancing the clock only looks at the timers that fire; waiting
+    timers cost nothing per tick. The scheduler's clock only moves when it's
+    advanced, so a paused game pauses every timer with it.
+"""
+import heapq
+
+# Indices into a timer entry. Entries are lists so that a timer can be
+# cancelled in place; cancelled entries are skipped when they're popped.
+DUE, SEQ, HANDLER, ARGS, INTERVAL, KEY = range(6)
+
+class Scheduler(object):
+    """Runs one-shot and repeating callbacks at given ticks.
+
+    Callbacks are given as the name of a method of `owner` rather than as
+    functions, which keeps the pending timers picklable for snapshots (see
+    Scheduler.get_state). Timers due on the same tick run in the order they
+    were scheduled.
+
+    Attributes:
+        owner: The object whose methods the timers call.
+        tick: The current tick; timers due on or before it run when the
+            scheduler is advanced.
+    """
+    def __init__(self, owner):
+        self.owner = owner
+        self.tick = 0
+        self._heap = []
+        self._keyed = {}
+        self._seq = 0
+
+    def schedule(self, delay, handler, args=(), interval=None, key=None):
+        """Calls `owner.handler(*args)` after `delay` ticks.
+
+        Args:
+            delay: Ticks from now; 0 runs the timer on the current tick.
+            handler: The name of the owner's method to call.
+            args: Arguments for the handler; must be picklable.
+            interval: If given, the timer repeats every `interval` ticks
+                after it first fires.
+            key: Optional name for the timer. Scheduling another timer with
+                the same key replaces it, e.g. to refresh a buff's duration.
+        Raises:
+            ValueError: If the interval isn't at least one tick.
+        """
+        if interval is not None and interval < 1:
+            raise ValueError("Scheduler.schedule(): A repeating timer's "
+                "interval must be at least one tick.")
+
+        if key is not None:
+            self.cancel(key)
+
+        timer = [self.tick + max(0, int(delay)), self._seq, handler,
+            tuple(args), interval, key]
+        self._seq += 1
+        heapq.heappush(self._heap, timer)
+        if key is not None:
+            self._keyed[key] = timer
+
+    def every(self, interval, handler, args=(), delay=0, key=None):
+        """Calls `owner.handler(*args)` every `interval` ticks, the first time
+        after `delay` ticks. See Scheduler.schedule."""
+        self.schedule(delay, handler, args, interval, key)
+
+    def cancel(self, key):
+        """Cancels the timer named `key`, if there is one."""
+        timer = self._keyed.pop(key, None)
+        if timer is not None:
+            timer[HANDLER] = None
+
+    def remaining(self, key):
+        """Returns the number of ticks until the timer named `key` runs, or
+        None if there's no such timer."""
+        timer = self._keyed.get(key)
+        return None if timer is None else timer[DUE] - self.tick
+
+    def advance(self):
+        """Runs the timers due on the current tick, then moves the clock on
+        by one tick."""
+        heap, tick = self._heap, self.tick
+
+        while heap and heap[0][DUE] <= tick:
+            timer = heapq.heappop(heap)
+            handler = timer[HANDLER]
+            if handler is None: # Cancelled
+                continue
+
+            if timer[INTERVAL] is not None: # Requeue before it can cancel
+                timer[DUE] += timer[INTERVAL]
+                timer[SEQ] = self._seq
+                self._seq += 1
+                heapq.heappush(heap, timer)
+            elif timer[KEY] is not None:
+                del self._keyed[timer[KEY]]
+
+            getattr(self.owner, handler)(*timer[ARGS])
+
+        self.tick += 1
+
+    def get_state(self):
+        """Returns a picklable copy of the clock and the pending timers."""
+        timers = sorted(list(timer) for timer in self._heap
+            if timer[HANDLER] is not None)
+        return self.tick, self._seq, timers
+
+    def set_state(self, state):
+        """Restores state returned by Scheduler.get_state, replacing every
+        pending timer."""
+        self.tick, self._seq, timers = state
+        self._heap = [list(timer) for timer in timers]
+        heapq.heapify(self._heap)
+        self._keyed = dict((timer[KEY], timer) for timer in self._heap
+            if timer[KEY] is not None)
+
+    def __len__(self):
+        return sum(1 for timer in self._heap if timer[HANDLER] is not None)
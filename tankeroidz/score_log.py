@@ -0,0 +1,176 @@
+"""
+    tankeroidz.score_log
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Append-only log of finished runs' scores. Scores are appended to the log
+    as fixed-width binary records and a small sidecar header keeps their
+    count, sum, minimum and maximum, so logging a score and reading the
+    stats costs the same however long the history is. The header is
+    replaced atomically; if it's lost or falls behind the log (e.g. the game
+    was killed between the two writes) it's repaired from the log.
+"""
+import os
+import struct
+
+import console
+
+MAGIC = 'TKSL'
+VERSION = 1
+
+# magic, version, record count, sum, min, max
+HEADER = struct.Struct('<4sHQqqq')
+
+# score
+RECORD = struct.Struct('<q')
+
+LOG_PATH = 'config/scores.log'
+HEADER_PATH = 'config/scores.hdr'
+
+# The old text format, one score per line; imported once if there's no log
+LEGACY_PATH = 'config/scores.txt'
+
+class ScoreStats(object):
+    """Aggregates of every logged score.
+
+    Attributes:
+        count: The number of scores.
+        total: The sum of the scores.
+        min: The lowest score, or None if there are none.
+        max: The highest score, or None if there are none.
+    """
+    def __init__(self, count=0, total=0, min=None, max=None):
+        self.count = count
+        self.total = total
+        self.min = min
+        self.max = max
+
+    @property
+    def avg(self):
+        return self.total / float(self.count) if self.count else None
+
+    def add(self, score):
+        self.count += 1
+        self.total += score
+        if self.min is None or score < self.min: self.min = score
+        if self.max is None or score > self.max: self.max = score
+
+class ScoreLog(object):
+    """A score log and its header on disk.
+
+    Attributes:
+        path: The path of the log.
+        header_path: The path of the sidecar header.
+        stats: The ScoreStats of the log.
+    """
+    def __init__(self, path=LOG_PATH, header_path=HEADER_PATH,
+            legacy_path=LEGACY_PATH):
+        self.path = path
+        self.header_path = header_path
+
+        if not os.path.exists(path) and legacy_path is not None:
+            self.migrate(legacy_path)
+
+        self.stats = self.load()
+
+    def append(self, score):
+        """Logs a score and updates the header. Returns the new ScoreStats."""
+        score = int(score)
+        with open(self.path, 'ab') as log_file:
+            log_file.write(RECORD.pack(score))
+
+        self.stats.add(score)
+        self.write_header()
+        return self.stats
+
+    def load(self):
+        """Reads the header, folding in any records it doesn't cover yet.
+        Returns the log's ScoreStats."""
+        records = self._record_count()
+        stats = self.read_header()
+
+        if stats is None or stats.count > records: # Missing or not ours
+            if os.path.exists(self.header_path):
+                console.warn("Score header << " + self.header_path + " >> "
+                    "doesn't match its log; rebuilding it.")
+            stats = ScoreStats()
+
+        if stats.count < records:
+            for score in self.scores(stats.count):
+                stats.add(score)
+            self.stats = stats
+            self.write_header()
+
+        return stats
+
+    def read_header(self):
+        """Returns the ScoreStats stored in the header, or None if it's
+        missing or unreadable."""
+        try:
+            with open(self.header_path, 'rb') as header_file:
+                data = header_file.read(HEADER.size)
+            magic, version, count, total, min_, max_ = HEADER.unpack(data)
+        except (IOError, struct.error):
+            return None
+
+        if magic != MAGIC or version != VERSION:
+            return None
+        if not count:
+            return ScoreStats()
+        return ScoreStats(count, total, min_, max_)
+
+    def write_header(self):
+        """Replaces the header with the current stats. The new header is
+        written to a temporary file first and renamed over the old one, so a
+        crash never leaves a half-written header."""
+        stats = self.stats
+        data = HEADER.pack(MAGIC, VERSION, stats.count, stats.total,
+            stats.min or 0, stats.max or 0)
+
+        temp_path = self.header_path + '.tmp'
+        with open(temp_path, 'wb') as header_file:
+            header_file.write(data)
+            header_file.flush()
+            os.fsync(header_file.fileno())
+
+        if os.name == 'nt' and os.path.exists(self.header_path):
+            os.remove(self.header_path) # os.rename won't replace on Windows
+        os.rename(temp_path, self.header_path)
+
+    def scores(self, start=0):
+        """Yields the logged scores, starting at record `start`."""
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, 'rb') as log_file:
+            log_file.seek(start * RECORD.size)
+            while True:
+                data = log_file.read(RECORD.size * 1024)
+                if len(data) < RECORD.size:
+                    break
+                for offset in xrange(0, len(data) - RECORD.size + 1,
+                        RECORD.size):
+                    yield RECORD.unpack_from(data, offset)[0]
+
+    def migrate(self, legacy_path):
+        """Imports the scores of a text score file, one per line."""
+        try:
+            with open(legacy_path, 'r') as legacy_file:
+                scores = [int(line) for line in legacy_file if line.strip()]
+        except IOError:
+            return
+
+        with open(self.path, 'ab') as log_file:
+            log_file.write(''.join(RECORD.pack(score) for score in scores))
+        console.log("Imported " + str(len(scores)) + " scores from << " +
+            legacy_path + " >>.")
+
+    def _record_count(self):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+        if size % RECORD.size: # A write was cut off; drop the partial record
+            with open(self.path, 'r+b') as log_file:
+                log_file.truncate(size - size % RECORD.size)
+        return size // RECORD.size
@@ -3,7 +3,9 @@ import screen
 import title_screen
 import console
 import ui
+import run_history
 from pygame.locals import *
+from score_log import ScoreLog
 
 class GameOverScreen(screen.Screen):
     def create(self, *args, **kwargs):
@@ -11,36 +13,80 @@ class GameOverScreen(screen.Screen):
             self.score = kwargs['score']
         except KeyError:
             console.error('Score not sent to GameOverScreen. No stats recorded.')
+            
+        # The rest of the run's stats; see run_history.RUN_FIELDS
+        self.run = dict((field, kwargs.get(field))
+            for field in run_history.RUN_FIELDS)
+        self.run['score'] = int(self.score)
+        self.difficulty_stats = None
+        self.runs_beaten_pct = None
+        self.pending_stats = None
 
         self.log_score()
         self.create_ui()
 
     def log_score(self):
-        scores_file = open("config/scores.txt", 'r+')
+        if not self.game.persist_scores:
+            self.scores_avg = self.scores_max = self.scores_min = self.score
+            return
+        
+        stats = ScoreLog().append(self.score)
 
-        scores_list = []
-        for line in scores_file:
-            scores_list.append(int(line.strip()))
-        scores_list.append(int(self.score))
-
-        scores_file.seek(0)
-        scores_file.write('\n'.join([str(s) for s in scores_list]))
-        scores_file.truncate()
-        scores_file.close()
-
-        self.scores_avg = sum(scores_list) / float(len(scores_list))
-        self.scores_max = max(scores_list)
-        self.scores_min = min(scores_list)
+        self.scores_avg = stats.avg
+        self.scores_max = stats.max
+        self.scores_min = stats.min
+        
+        self.log_run()
+        
+    def log_run(self):
+        """Records the run in the run history and asks for the stats of the
+        run's difficulty, which are shown under the all-time stats once they
+        arrive (see GameOverScreen.update)."""
+        history = self.game.run_history
+        self.pending_stats = None
+        if history is None or None in self.run.values():
+            return
+        
+        # Both are handled on the history's thread, in order, so the stats
+        # include this run
+        history.record(**self.run)
+        self.pending_stats = history.summary(self.run['difficulty'],
+            self.run['score'])
+        
+    def update(self):
+        pending = self.pending_stats
+        if pending is None or not pending.ready:
+            return
+        
+        self.pending_stats = None
+        if pending.value is None: # The query failed; only all-time stats
+            return
+        
+        stats, beaten = pending.value
+        self.difficulty_stats = stats
+        self.runs_beaten_pct = 100.0 * beaten / stats.count
+        self.create_ui()
 
     def create_ui(self):
        gui = ui.load_ui("resources/ui/game_over_ui.ini",
-            (self.game.settings['width'], self.game.settings['height']))
+            (self.game.settings.width, self.game.settings.height))
        
 #       gui['max_score'].text += " " + str(self.scores_max)
        gui['max_score'].text += " " + str(self.scores_max + 1) + " (Devin Froseth)"
        gui['min_score'].text += " " + str(self.scores_min)
        gui['avg_score'].text += " " + str(int(self.scores_avg))
        
+       # The run's difficulty, once the run history has answered
+       stats = self.difficulty_stats
+       if stats is not None:
+           on = " " + str(self.run['difficulty']) + ": "
+           gui['difficulty_best'].text += on + str(stats.max)
+           gui['difficulty_avg'].text += on + str(int(stats.avg))
+           gui['runs_beaten'].text += on + str(int(self.runs_beaten_pct)) + "%"
+       else:
+           for name in ('difficulty_best', 'difficulty_avg', 'runs_beaten'):
+               gui[name].text = ""
+       
        self.ui = gui
        
     def handle_input(self, event):
@@ -2,6 +2,8 @@ import pygame
 import random
 import screen
 import console
+import entity_store
+import archetypes
 
 from game_over_screen import GameOverScreen
 from pygame.locals import *
@@ -9,6 +11,14 @@ from entities import *
 from ui import *
 from io_utils import *
 from math_utils import *
+from spatial import SpatialHash
+from arena import EntityArena
+from pool import Pool
+from scheduler import Scheduler
+from graphics import tank_rotations
+from profiler import Profiler, ProfilerOverlay
+from console_overlay import ConsoleOverlay
+from config import schema
 
 class PlayScreen(screen.Screen):
     """Playing screen"""
@@ -17,38 +27,94 @@ class PlayScreen(screen.Screen):
     STATE_RUNNING = 0
     STATE_PAUSED  = 1
     
+    # Cell size (px) of the collision grids; should be larger than most radii
+    GRID_CELL_SIZE = 32
+    
+    # Distance (px) the tank sprite is drawn behind the tank's position
+    TANK_SPRITE_OFFSET = 6
+    
+    BACKGROUND_COLOR = 0, 128, 128
+    
+    # The systems run by PlayScreen.update, in order
+    SYSTEMS = ('bullet_system', 'movement_system', 'collision_system',
+        'status_system', 'timer_system')
+    
+    # Enemy spawn wave timing (seconds)
+    FIRST_SPAWN_DELAY = 3
+    SPAWN_INTERVAL = .75
+    
+    # Survival score: points awarded every SCORE_INTERVAL seconds
+    SCORE_INTERVAL = 3
+    SCORE_POINTS = 10
+    
     def create(self, *args, **kwargs):
-        # Containers for entities (game objects)
-        self.enemies, self.bullets, self.powerups = [], [], []
+        # Containers for entities (game objects). Killed entities are removed
+        # at the end of the tick (see PlayScreen.release_despawned).
+        self.enemies = EntityArena()
+        self.bullets = EntityArena()
+        self.powerups = EntityArena()
+        
+        # Optionally keep bullets and enemies in NumPy columns
+        self.array_entities = self.game.settings.array_entities
+        if self.array_entities:
+            if entity_store.numpy is None:
+                console.warn("NumPy not found; array entities are disabled.")
+                self.array_entities = False
+            else:
+                self.enemies = entity_store.EntityStore()
+                self.bullets = entity_store.EntityStore()
+        
+        # Dead bullets, enemies and powerups are reused (see pool.Pool)
+        high_water = self.game.settings.pool_high_water
+        self.pools = dict((cls, Pool(cls, high_water))
+            for cls in [Bullet, Enemy] + archetypes.types(Powerup))
+        self.despawned = [] # returned to the pools at the end of each tick
+        
+        # Broadphase grids, rebuilt by the collision system every tick
+        self.enemy_grid = SpatialHash(PlayScreen.GRID_CELL_SIZE)
+        self.powerup_grid = SpatialHash(PlayScreen.GRID_CELL_SIZE)
         
         self.ticks, self.run_ticks = 0, 0
         self.score = 0
+        self.kills, self.powerups_collected = 0, 0
         
         self.difficulty = kwargs.get('difficulty', 'easy')
         self.load_config()
+        
+        self.tank_model = kwargs.get('tank', 'classic')
 
         self.create_tank(kwargs.get('tank', 'classic'))
 
         self.create_ui()
         self.create_pause_ui()
         
-        self.ticks_until_enemy_spawn = self.game.settings['fps'] * 3
+        self.profiler, self.profiler_overlay = None, None
+        if self.game.settings.show_profiler:
+            self.toggle_profiler()
+        
+        self.console_overlay = None
+        if self.game.settings.show_console:
+            self.toggle_console()
+        
+        # Optionally only update the parts of the display that changed
+        self.dirty_rects = self.game.settings.dirty_rects
+        self.dirty_rect_max_pct = self.game.settings.dirty_rect_max_pct
+        self.prev_rects, self.drawn_rects = None, []
+        
+        # Timed events run on the clock of the running game, so they pause
+        # with it (see PlayScreen.timer_system)
+        self.scheduler = Scheduler(self)
+        self.scheduler.every(self.seconds(PlayScreen.SCORE_INTERVAL),
+            'add_score', (PlayScreen.SCORE_POINTS,))
+        self.scheduler.every(self.seconds(PlayScreen.SPAWN_INTERVAL),
+            'spawn_enemy', delay=self.seconds(PlayScreen.FIRST_SPAWN_DELAY))
+        
         self.set_state(PlayScreen.STATE_RUNNING)
         
     def load_config(self):
         try:
-            cfg = ini_to_dict('config/play_config.ini')
-            
-            # Fixes difficulty configurations by copying default settings to
-            # each difficulty's specific dict. This workaround removes the need
-            # for if statements that check both difficulty specific settings and
-            # default settings.
-            for setting in cfg['default']:
-                if setting not in cfg[self.difficulty]:
-                    cfg[self.difficulty][setting] = cfg['default'][setting]
-            
-            self.config = cfg[self.difficulty]
-                
+            # The default settings are already merged into each difficulty
+            self.config = schema.load_play_config()[self.difficulty]
         except IOError:
             print "Couldn't load play config!" #TODO
     
@@ -56,14 +122,18 @@ class PlayScreen(screen.Screen):
         """Create the tank object and load some of its attributes from this
         difficulty setting's config."""
         self.tank = Tank(model)
-        self.tank.turn_radius = self.config['tank_turnradius']
-        self.tank.move_speed = self.config['tank_speed']
-        self.tank.wall_walking = self.config['wall_walking']
+        self.tank.turn_radius = self.config.tank_turnradius
+        self.tank.move_speed = self.config.tank_speed
+        self.tank.wall_walking = self.config.wall_walking
+        
+        if self.game.settings.prewarm_sprites:
+            tank_rotations.prewarm(model, self.tank.sprite,
+                PlayScreen.TANK_SPRITE_OFFSET)
 
     def create_ui(self):
         """Create the HUD"""
         ui_path = 'resources/ui/play_ui.ini'
-        w, h = self.game.settings['width'], self.game.settings['height']
+        w, h = self.game.settings.width, self.game.settings.height
     
         self.ui = load_ui(ui_path, (w, h))
         
@@ -75,7 +145,7 @@ class PlayScreen(screen.Screen):
     def create_pause_ui(self):
         """Create the pause menu UI."""
         pause_ui_path = 'resources/ui/pause_ui.ini'
-        w, h = self.game.settings['width'], self.game.settings['height']
+        w, h = self.game.settings.width, self.game.settings.height
         
         self.pause_ui = load_ui(pause_ui_path, (w, h))
         menu_scale = 0.8
@@ -96,23 +166,53 @@ class PlayScreen(screen.Screen):
         except AttributeError as e:
             console.warn("Can't center at line 103.")
             
+    def toggle_profiler(self):
+        """Turns the per-stage timers and their overlay on or off."""
+        if self.profiler is None:
+            self.profiler = Profiler()
+            self.profiler_overlay = ProfilerOverlay(self.profiler)
+        else:
+            self.profiler, self.profiler_overlay = None, None
+            
+    def toggle_console(self):
+        """Shows or hides the console overlay."""
+        if self.console_overlay is None:
+            width = self.game.settings.width
+            overlay = ConsoleOverlay(width=width - 20)
+            overlay.pos = 10, self.game.settings.height - overlay.height - 10
+            
+            console.CONSOLES.append(overlay)
+            self.console_overlay = overlay
+        else:
+            console.CONSOLES.remove(self.console_overlay)
+            self.console_overlay = None
+            
+    def exit(self):
+        if self.console_overlay is not None: # Stop collecting records
+            self.toggle_console()
+            
     def handle_input(self, event):
         hotkeys = self.game.keybindings
         
+        if event.type == KEYDOWN and event.key in hotkeys.get('console', []):
+            self.toggle_console()
+        if event.type == KEYDOWN and event.key in hotkeys.get('profiler', []):
+            self.toggle_profiler()
+        
         if self.state == PlayScreen.STATE_PAUSED:
             if event.type == KEYDOWN:
                 if event.key in hotkeys['pause']:
                     self.set_state(PlayScreen.STATE_RUNNING)
             elif event.type == MOUSEBUTTONUP:
                 if event.button == 1:
-                    c = self.pause_ui.get_component_at_pos(pygame.mouse.get_pos())
+                    c = self.pause_ui.get_component_at_pos(event.pos)
                     if c is not None:
                         if c.name == 'button_quit':
                             pygame.event.post(pygame.event.Event(QUIT))
                         elif c.name == 'button_resume':
                             self.set_state(PlayScreen.STATE_RUNNING)
                         elif c.name == 'button_restart':
-                            self.game.set_screen(GameOverScreen(self.game))
+                            self.game_over()
                             
         if self.state == PlayScreen.STATE_RUNNING:
             if event.type == KEYDOWN:
@@ -148,12 +248,9 @@ class PlayScreen(screen.Screen):
         
     def update(self):
         if self.state == self.STATE_RUNNING:
-            self.bullet_system()
-            self.movement_system()
-            self.collision_system()
-            self.spawn_system()
-            self.status_system()
-            self.timed_event_system()
+            for name in PlayScreen.SYSTEMS:
+                self.timed(name, getattr(self, name))
+            self.release_despawned()
             self.ui.update()
             self.run_ticks += 1
         elif self.state == self.STATE_PAUSED:
@@ -162,44 +259,40 @@ class PlayScreen(screen.Screen):
         self.ticks += 1
     
     def status_system(self):
-        """Manages resources (health/power) and buffs."""
+        """Manages resources (health/power)."""
         tank = self.tank
-        rate = float(self.game.settings['fps'])
+        rate = float(self.game.settings.fps)
         
         # Kill everything with no health - this must come before any regen!
         if tank.health <= 0:
-            self.game.set_screen(GameOverScreen(self.game, score=self.score))
+            self.game_over()
             
         for enemy in self.enemies:
             if enemy.health <= 0:
-                self.enemies.remove(enemy)
+                self.despawn(self.enemies, enemy)
         for bullet in self.bullets:
             if bullet.health <= 0:
-                self.bullets.remove(bullet)
+                self.despawn(self.bullets, bullet)
         for powerup in self.powerups:
             if powerup.health <= 0:
-                self.powerups.remove(powerup)
+                self.despawn(self.powerups, powerup)
         
         # Decrement power if using speed boost
         if tank.using_boost and tank.speed != 0:
             tank.power -= tank.max_power * .02 # TODO hardcoded speed cost
 
         # Health regeneration and wrapping
-        tank.health += tank.get('health_regen') / rate
+        tank.health += tank.health_regen / rate
         if tank.health > tank.max_health: tank.health = tank.max_health
           
         # Power regeneration and wrapping
-        tank.power += tank.get('power_regen') / rate
+        tank.power += tank.power_regen / rate
         if tank.power > tank.max_power: tank.power = tank.max_power
-
-        # Check all buff timers and remove expired buffs
-        # {http://stackoverflow.com/questions/11941817/python-runtimeerror-dictionary-changed-size-during-iteration-how-to-avoid-th}
-        for key in tank.mod_timers.keys(): 
-            tank.mod_timers[key] -= 1.0 / self.game.settings['fps']
-            if tank.mod_timers[key] <= 0: # The cooldown timer has expired
-                del tank.mod_timers[key]
-                del tank.modifiers[key]
-                if key in tank.effects: del tank.effects[key]
+    
+    def timer_system(self):
+        """Runs the timed events (spawns, score, buff expiry) that are due
+        this tick."""
+        self.scheduler.advance()
     
     def bullet_system(self):
         """Create new bullets if the user requests and is not on cooldown."""
@@ -210,7 +303,7 @@ class PlayScreen(screen.Screen):
             
         # If the fire button isn't pressed or fire is on cooldown, exit system
         ticks_since_last = self.run_ticks - self.tank.bullet_last_shot_tick
-        max_cd_ticks = self.game.settings['fps'] * self.tank.bullet_cooldown_max
+        max_cd_ticks = self.game.settings.fps * self.tank.bullet_cooldown_max
         if not self.tank.bullet_fire_now or ticks_since_last <= max_cd_ticks:
             return
             
@@ -218,14 +311,14 @@ class PlayScreen(screen.Screen):
 
     def movement_system(self):
         """Handles the movement of all game objects."""
-        map_width = self.game.settings['width']
-        map_height = self.game.settings['height']
+        map_width = self.game.settings.width
+        map_height = self.game.settings.height
         
         tank = self.tank
-        ms_mult = self.config['tank_boost_pct']/100.0 if tank.using_boost else 1
+        ms_mult = self.config.tank_boost_pct/100.0 if tank.using_boost else 1
         
-        move_step = tank.get('speed') * tank.get('move_speed')*ms_mult
-        tank.rot -= tank.get('dir') * tank.get('turn_radius')
+        move_step = tank.speed * tank.move_speed * ms_mult
+        tank.rot -= tank.dir * tank.turn_radius
         
         # Move the tank
         dx = math.sin(math.radians(tank.rot)) * -move_step
@@ -234,7 +327,7 @@ class PlayScreen(screen.Screen):
         new_x, new_y = tank.x + dx, tank.y + dy
 
         # Handle the tank trying to escape the confines of the map
-        if tank.get('wall_walking'): # Move through walls (wrapping)
+        if tank.wall_walking: # Move through walls (wrapping)
             if new_x < 0: new_x = map_width
             elif new_x > map_width: new_x = 0
             
@@ -250,6 +343,11 @@ class PlayScreen(screen.Screen):
         tank.gun_x = tank.x - math.sin(math.radians(tank.rot)) * tank.gun_length
         tank.gun_y = tank.y - math.cos(math.radians(tank.rot)) * tank.gun_length        
     
+        if self.array_entities:
+            self.bullets.move()
+            self.enemies.move()
+            return
+        
         # Bullet movement
         for bullet in self.bullets:
             bullet.x -= math.sin(math.radians(bullet.rot))*bullet.move_speed
@@ -261,79 +359,136 @@ class PlayScreen(screen.Screen):
             enemy.y -= math.cos(math.radians(enemy.rot))*enemy.move_speed
     
     def collision_system(self):
-        map_width = self.game.settings['width']
-        map_height = self.game.settings['height']
-        
-        for bullet in self.bullets:
-            # Bullet-wall collision
-            if (bullet.x < 0 or bullet.x > map_width or
-                    bullet.y < 0 or bullet.y > map_height):
-                self.bullets.remove(bullet)
-                continue
+        map_width = self.game.settings.width
+        map_height = self.game.settings.height
+        
+        if self.array_entities:
+            self.vectorized_bullet_collisions()
+            self.enemies.kill_where(self.enemies.outside(map_width,
+                map_height, False))
+        
+        # Broadphase: only objects sharing a grid cell are tested for collision
+        enemy_grid = self.enemy_grid
+        enemy_grid.clear()
+        enemy_grid.insert_all(self.enemies)
+        
+        if not self.array_entities:
+            for bullet in self.bullets:
+                # Bullet-wall collision
+                if (bullet.x < 0 or bullet.x > map_width or
+                        bullet.y < 0 or bullet.y > map_height):
+                    self.despawn(self.bullets, bullet)
+                    continue
             
-            # Bullet-enemy
-            for enemy in self.enemies:
-                force_break = 0
-                if circle_collision(bullet, enemy):
-                    if random.randint(0, 100) <= self.config['powerup_chance']:
-                        powerup = PowerupFactory.create_random()
-                        powerup.x, powerup.y = enemy.x, enemy.y
-                        self.powerups.append(powerup)
+                # Bullet-enemy
+                for enemy in enemy_grid.query(bullet):
+                    if circle_collision(bullet, enemy):
+                        if random.randint(0, 100) <= self.config.powerup_chance:
+                            powerup = PowerupFactory.create_random(
+                                self.pools)
+                            powerup.x, powerup.y = enemy.x, enemy.y
+                            self.powerups.append(powerup)
 
-                    points = enemy.move_speed * 2
-                    self.add_score(points)
-                    self.enemies.remove(enemy)
-                    self.bullets.remove(bullet)
-                    force_break = 1
-                    
-                # NOTE: Workaround to prevent nonexistent bullets (bullets that
-                # were already killed) from being tested against
-                if force_break: break
+                        points = enemy.move_speed * 2
+                        self.add_score(points)
+                        self.kills += 1
+                        self.despawn(self.enemies, enemy)
+                        enemy_grid.remove(enemy)
+                        self.despawn(self.bullets, bullet)
                     
+                        # Stop testing the bullet because it has been deleted
+                        break
+        
+        near_tank = set(enemy_grid.query(self.tank))
+        
         for enemy in self.enemies:
             # Enemy-wall
             if not 0 < enemy.x < map_width or not 0 < enemy.y < map_height:
-                self.enemies.remove(enemy)
+                self.despawn(self.enemies, enemy)
+                enemy_grid.remove(enemy)
                 continue
                 
             # Enemy-tank
-            if circle_collision(enemy, self.tank):
-                self.tank.health -= enemy.impact * self.tank.get('damage_modifier')
-                self.enemies.remove(enemy)
+            if enemy in near_tank and circle_collision(enemy, self.tank):
+                self.tank.health -= enemy.impact * self.tank.damage_modifier
+                self.despawn(self.enemies, enemy)
+                enemy_grid.remove(enemy)
                 continue
                 
             # Enemy-enemy
-            for enemy2 in self.enemies:
+            for enemy2 in enemy_grid.query(enemy):
                 if circle_collision(enemy, enemy2) and enemy != enemy2:
-                    self.enemies.remove(enemy)
-                    self.enemies.remove(enemy2)
+                    self.despawn(self.enemies, enemy)
+                    self.despawn(self.enemies, enemy2)
+                    enemy_grid.remove(enemy)
+                    enemy_grid.remove(enemy2)
                     break # Stop iterating because `enemy` has been deleted
+        
+        powerup_grid = self.powerup_grid
+        powerup_grid.clear()
+        powerup_grid.insert_all(self.powerups)
             
-        for powerup in self.powerups:
+        for powerup in powerup_grid.query(self.tank):
             # Powerup-tank
             if circle_collision(powerup, self.tank):
-                self.tank.apply_powerup(powerup)
+                self.apply_powerup(powerup)
+                self.powerups_collected += 1
                 powerup.health = 0
                 console.log("Picked up powerup: " + powerup.name)
             
-    def spawn_system(self):
-        self.ticks_until_enemy_spawn -= 1
-        if self.ticks_until_enemy_spawn >= 0:
+    def vectorized_bullet_collisions(self):
+        """Bullet-wall and bullet-enemy collisions for array-backed entities.
+        Every bullet is tested against every enemy in one broadcast pass and
+        each bullet kills the first (lowest index) enemy it touches. Like the
+        list path, kills are deferred to the end of the tick."""
+        bullets, enemies = self.bullets, self.enemies
+        np = entity_store.numpy
+        
+        bullets.kill_where(bullets.outside(self.game.settings.width,
+            self.game.settings.height))
+        if not len(bullets) or not len(enemies):
             return
+        
+        bx, by = bullets.column('x')[:, None], bullets.column('y')[:, None]
+        br = bullets.column('radius')[:, None]
+        ex, ey = enemies.column('x'), enemies.column('y')
+        er = enemies.column('radius')
+        
+        hits = np.hypot(ex - bx, ey - by) <= er + br
+        hits &= bullets.alive()[:, None]
+        dead_enemies = ~enemies.alive()
+        
+        for b in np.flatnonzero(hits.any(axis=1)):
+            targets = np.flatnonzero(hits[b] & ~dead_enemies)
+            if not len(targets):
+                continue
             
-        enemy = Enemy()
+            enemy = enemies[targets[0]]
+            if random.randint(0, 100) <= self.config.powerup_chance:
+                powerup = PowerupFactory.create_random(self.pools)
+                powerup.x, powerup.y = enemy.x, enemy.y
+                self.powerups.append(powerup)
+            
+            self.add_score(enemy.move_speed * 2)
+            self.kills += 1
+            dead_enemies[targets[0]] = True
+            self.despawn(enemies, enemy)
+            self.despawn(bullets, bullets[b])
+            
+    def spawn_enemy(self):
+        enemy = self.pools[Enemy].acquire()
         max_speed = 8
         min_r, max_r = 4, 11
         
         # Spawn either on y- or x-border, somewhat randomly
         if random.choice(['x', 'y']) == 'x':
-            enemy.x = random.choice([0, self.game.settings['width']])
-            enemy.y = random.randint(0, self.game.settings['height'])
+            enemy.x = random.choice([0, self.game.settings.width])
+            enemy.y = random.randint(0, self.game.settings.height)
         else:
-            enemy.x = random.randint(0, self.game.settings['width'])
-            enemy.y = random.choice([0, self.game.settings['height']])
+            enemy.x = random.randint(0, self.game.settings.width)
+            enemy.y = random.choice([0, self.game.settings.height])
         
-        enemy_speed_mod = self.config['enemy_speed_pct'] / 100.0
+        enemy_speed_mod = self.config.enemy_speed_pct / 100.0
         
         enemy.radius = random.randint(min_r, max_r)
         enemy.move_speed = (max_speed + min_r - enemy.radius) * enemy_speed_mod
@@ -343,85 +498,143 @@ class PlayScreen(screen.Screen):
         dy = enemy.y - self.tank.y
         enemy.rot = math.atan2(dx, dy) * 180/math.pi
         
+        if self.game.settings.render_images:
+            enemy.load_sprite()
+        
         self.enemies.append(enemy)
-        self.ticks_until_enemy_spawn = .75 * self.game.settings['fps']
-        #TODO
     
-    def timed_event_system(self):
-        fps = float(self.game.settings['fps'])
-        secs_per_point_increment = 3
-        points_per_increment = 10
-        
-        if (self.ticks / fps) % secs_per_point_increment == 0:
-            self.add_score(points_per_increment)
+    def apply_powerup(self, powerup):
+        """Buffs the tank and times the buff's expiry."""
+        self.tank.apply_powerup(powerup)
+        if powerup.duration > 0: # Replaces the timer of the same powerup
+            self.scheduler.schedule(self.seconds(powerup.duration),
+                'expire_powerup', (powerup.name,), key=('powerup', powerup.name))
+    
+    def expire_powerup(self, name):
+        self.tank.expire_powerup(name)
+    
+    def seconds(self, secs):
+        """Converts seconds of game time to ticks."""
+        return int(math.ceil(secs * self.game.settings.fps))
             
     def render(self):
+        """Renders the game. Returns the list of rects that changed when only
+        part of the frame needs updating (see PlayScreen.render_dirty),
+        otherwise None."""
+        if self.dirty_rects and self.state == self.STATE_RUNNING:
+            return self.render_dirty()
+        
+        self.prev_rects = None # The next dirty frame must redraw everything
         self.render_running()
         
         if self.state == self.STATE_PAUSED:
             self.render_paused()
             
     def render_running(self):
-        render_vecs = 0
-        
         # Render the background
-        self.game.frame.fill((0, 128, 128))
+        self.game.frame.fill(PlayScreen.BACKGROUND_COLOR)
+        self.draw_running()
+        
+    def render_dirty(self):
+        """Erases only what was drawn last frame, draws the game and returns
+        the rects that changed. Returns None (update the whole display) on
+        the first frame, or when the changed area is more than
+        `dirty_rect_max_pct` percent of the frame."""
+        frame = self.game.frame
+        prev_rects = self.prev_rects
+        
+        if prev_rects is None:
+            frame.fill(PlayScreen.BACKGROUND_COLOR)
+        else:
+            for rect in prev_rects:
+                frame.fill(PlayScreen.BACKGROUND_COLOR, rect)
+                
+        self.draw_running()
+        self.prev_rects = self.drawn_rects
+        
+        if prev_rects is None:
+            return None
+        
+        rects = prev_rects + self.drawn_rects
+        max_area = (frame.get_width() * frame.get_height() *
+            self.dirty_rect_max_pct / 100.0)
+        if sum(rect.width * rect.height for rect in rects) > max_area:
+            return None
+        return rects
+        
+    def draw_running(self):
+        """Draws the game over the background, collecting every drawn area in
+        `self.drawn_rects`."""
+        self.drawn_rects = []
+        render_vecs = 0
         
         # Render images as long as image rendering isn't disabled
-        if self.game.settings['render_images']:
-            render_vecs = self.render_running_rasters()
+        if self.game.settings.render_images:
+            render_vecs = self.timed('render_rasters',
+                self.render_running_rasters)
         
         # Render vectors if they're enabled or there was an issue rendering imgs
-        if self.game.settings['render_vectors'] or render_vecs:
-            self.render_running_vectors()
+        if self.game.settings.render_vectors or render_vecs:
+            self.timed('render_vectors', self.render_running_vectors)
+            
+        self.timed('render_HUD', self.render_HUD)
+        
+        if self.profiler_overlay is not None:
+            self.drawn_rects.extend(
+                self.profiler_overlay.render(self.game.frame))
+        if self.console_overlay is not None:
+            self.drawn_rects.extend(
+                self.console_overlay.render(self.game.frame))
             
-        self.render_HUD()
+    def timed(self, name, func):
+        """Calls `func`, timing it as the stage `name` if profiling is on."""
+        if self.profiler is None:
+            return func()
+        return self.profiler.call(name, func)
     
     def render_running_rasters(self):
+        frame, drawn = self.game.frame, self.drawn_rects.append
+        
         # Render powerups
         for powerup in self.powerups:
             p_sprite = get_image("powerup_" + powerup.name)
             p_bounds = p_sprite.get_rect()
             p_bounds.center = powerup.x, powerup.y
-            self.game.frame.blit(p_sprite, p_bounds)
+            drawn(frame.blit(p_sprite, p_bounds))
 
         # Render Tank
         tank = self.tank
         
-        sprite_offset_x = math.sin(math.radians(tank.rot)) * 6
-        sprite_offset_y = math.cos(math.radians(tank.rot)) * 6
         # TODO: find out why `6` is the magic number for offset.... DF
+        rotated = tank_rotations.get(tank.model, tank.sprite, tank.rot,
+            PlayScreen.TANK_SPRITE_OFFSET)
         
-        tank_sprite = pygame.transform.rotate(tank.sprite, tank.rot)
-        tank_bounds = tank_sprite.get_rect()
-        tank_bounds.center = (tank.x-sprite_offset_x, tank.y-sprite_offset_y)
-        for effect in tank.effects: # Apply visual effects from powerups
-            tank_sprite.fill(tank.effects[effect], special_flags=BLEND_RGB_MULT)
-        self.game.frame.blit(tank_sprite, tank_bounds)
+        tank_sprite = rotated.surface
+        if tank.effects: # Apply visual effects from powerups to a copy
+            tank_sprite = tank_sprite.copy()
+            for effect in tank.effects:
+                tank_sprite.fill(tank.effects[effect], special_flags=BLEND_RGB_MULT)
+        drawn(frame.blit(tank_sprite, rotated.bounds_at(tank.x, tank.y)))
         
         # Render bullets
         for bullet in self.bullets:
             bullet_bounds = bullet.sprite.get_rect()
             bullet_bounds.center = bullet.x, bullet.y
             
-            self.game.frame.blit(bullet.sprite, bullet_bounds)
+            drawn(frame.blit(bullet.sprite, bullet_bounds))
 
         # Render enemies
         for enemy in self.enemies:
-            enemy_sprite = pygame.transform.scale(enemy.sprite,
-                (enemy.width, enemy.height))
-            enemy_sprite = pygame.transform.rotate(enemy_sprite, enemy.rot)
-            
-            enemy_bounds = enemy_sprite.get_rect() 
-            enemy_bounds.center = enemy.x, enemy.y
-            
-            self.game.frame.blit(enemy_sprite, enemy_bounds)
+            drawn(frame.blit(enemy.sprite,
+                enemy.rotated.bounds_at(enemy.x, enemy.y)))
     
     def render_running_vectors(self):
+        frame, drawn = self.game.frame, self.drawn_rects.append
+        
         # Powerups
         for powerup in self.powerups:
-            pygame.draw.circle(self.game.frame, (0, 255, 0),
-                (int(powerup.x), int(powerup.y)), int(powerup.radius))
+            drawn(pygame.draw.circle(frame, (0, 255, 0),
+                (int(powerup.x), int(powerup.y)), int(powerup.radius)))
         
         # Render Tank
         tank = self.tank
@@ -436,22 +649,22 @@ class PlayScreen(screen.Screen):
         tank_col = red, green, blue
         
         # Render tank hitbox
-        pygame.draw.circle(self.game.frame, tank_col,
-                (int(tank.x), int(tank.y)), int(tank.radius), 0)
+        drawn(pygame.draw.circle(frame, tank_col,
+                (int(tank.x), int(tank.y)), int(tank.radius), 0))
         
         # Render tank gun
-        pygame.draw.line(self.game.frame, tank_col, (tank.x, tank.y),
-                (tank.gun_x, tank.gun_y), tank.gun_stroke)
+        drawn(pygame.draw.line(frame, tank_col, (tank.x, tank.y),
+                (tank.gun_x, tank.gun_y), tank.gun_stroke))
         
         # Render bullets
         for bullet in self.bullets:
-            pygame.draw.circle(self.game.frame, (255, 0, 0),
-                    (int(bullet.x), int(bullet.y)), int(bullet.radius))
+            drawn(pygame.draw.circle(frame, (255, 0, 0),
+                    (int(bullet.x), int(bullet.y)), int(bullet.radius)))
 
         # Render enemies
         for enemy in self.enemies:
-            pygame.draw.circle(self.game.frame, enemy.color,
-                    (int(enemy.x), int(enemy.y)), int(enemy.radius), 0)
+            drawn(pygame.draw.circle(frame, enemy.color,
+                    (int(enemy.x), int(enemy.y)), int(enemy.radius), 0))
        
     def render_paused(self):
         #self.game.frame.fill((0,0,0))
@@ -464,10 +677,100 @@ class PlayScreen(screen.Screen):
         score_label = self.ui.get('score_label')
         
         score_label.text = "Score: " + str(int(self.score))
-        score_label.x = self.game.settings['width'] - score_label.width - 10
+        score_label.x = self.game.settings.width - score_label.width - 10
         
-        self.ui.render(self.game.frame)
+        self.drawn_rects.extend(self.ui.render(self.game.frame))
 
+    def snapshot(self):
+        """Returns a picklable snapshot of the game in progress, used for
+        replay keyframes. See PlayScreen.from_snapshot."""
+        def states(entities):
+            result = []
+            for entity in entities:
+                obj = getattr(entity, 'obj', entity) # unwrap EntityViews
+                state = obj.get_state()
+                if obj is not entity: # Array-backed columns are authoritative
+                    for name in entity_store.EntityStore.COLUMNS:
+                        if name != 'radius':
+                            state[name] = getattr(entity, name)
+                result.append(state)
+            return result
+        
+        return {
+            'tank_model': self.tank_model,
+            'difficulty': self.difficulty,
+            'state': self.state,
+            'ticks': self.ticks,
+            'run_ticks': self.run_ticks,
+            'score': self.score,
+            'kills': self.kills,
+            'powerups_collected': self.powerups_collected,
+            'timers': self.scheduler.get_state(),
+            'tank': self.tank.get_state(),
+            'enemies': states(self.enemies),
+            'bullets': states(self.bullets),
+            'powerups': states(self.powerups)
+        }
+    
+    @staticmethod
+    def from_snapshot(game, snapshot):
+        """Creates a PlayScreen from a snapshot made by PlayScreen.snapshot."""
+        screen = PlayScreen(game, tank=snapshot['tank_model'],
+            difficulty=snapshot['difficulty'])
+        
+        screen.set_state(snapshot['state'])
+        screen.ticks = snapshot['ticks']
+        screen.run_ticks = snapshot['run_ticks']
+        screen.score = snapshot['score']
+        screen.kills = snapshot['kills']
+        screen.powerups_collected = snapshot['powerups_collected']
+        screen.scheduler.set_state(snapshot['timers'])
+        screen.tank.set_state(snapshot['tank'])
+        
+        for state in snapshot['enemies']:
+            enemy = Enemy()
+            enemy.set_state(state)
+            if game.settings.render_images:
+                enemy.load_sprite()
+            screen.enemies.append(enemy)
+        
+        for state in snapshot['bullets']:
+            bullet = Bullet()
+            bullet.set_state(state)
+            screen.bullets.append(bullet)
+        
+        for state in snapshot['powerups']:
+            powerup = archetypes.get(Powerup, state['name'])()
+            powerup.set_state(state)
+            screen.powerups.append(powerup)
+        
+        return screen
+    
+    def despawn(self, entities, entity):
+        """Kills an entity. Loops over its container skip it from now on; it's
+        removed, and goes back to its pool, at the end of the tick when
+        nothing refers to it anymore."""
+        entities.kill(entity)
+        
+    def release_despawned(self):
+        """Removes the entities killed this tick from their containers and
+        returns them to their pools."""
+        for entities in (self.enemies, self.bullets, self.powerups):
+            self.despawned.extend(entities.flush())
+        
+        pools = self.pools
+        for entity in self.despawned:
+            obj = getattr(entity, 'obj', entity) # unwrap EntityViews
+            pools[type(obj)].release(obj)
+        del self.despawned[:]
+    
+    def game_over(self):
+        """Ends the run and shows its stats."""
+        self.game.set_screen(GameOverScreen(self.game, score=self.score,
+            difficulty=self.difficulty, tank=self.tank_model,
+            ticks=self.run_ticks, kills=self.kills,
+            powerups=self.powerups_collected))
+        
     def add_score(self, n):
         self.score += n
         
@@ -476,7 +779,7 @@ class PlayScreen(screen.Screen):
         self.state = state
         
     def spawn_one_bullet(self):
-        bullet = Bullet()
+        bullet = self.pools[Bullet].acquire()
         bullet.x, bullet.y = self.tank.gun_x, self.tank.gun_y
         bullet.rot = self.tank.rot
         self.bullets.append(bullet)
@@ -18,7 +18,7 @@ class TitleScreen(screen.Screen):
     
     def create_ui(self):
         self.settings_ui = ui.load_ui('resources/ui/settings_menu.ui',
-            (self.game.settings['width'], self.game.settings['height']))
+            (self.game.settings.width, self.game.settings.height))
             
         for component in self.settings_ui.components:
             self.settings_ui.center_component(component.name, 1, 0)
@@ -29,7 +29,7 @@ class TitleScreen(screen.Screen):
         self.tanks_by_key = {}
     
         tank_ui = ui.load_ui('resources/ui/tank_select.ini',
-            (self.game.settings['width'], self.game.settings['height']))
+            (self.game.settings.width, self.game.settings.height))
         
         tank_x, tank_y = 54, 100
         pad_x, pad_y = 60, 40
@@ -49,8 +49,9 @@ class TitleScreen(screen.Screen):
         y_offset = (self.game.settings['height'] - max_y) / 2'''
         x_offset, y_offset = 40, 60
         
-        for k, v in io_utils.image_cache.iteritems():
-            if k.startswith("tank_") and "classic" not in k:
+        for k in io_utils.find_images(prefix="tank_"):
+            if "classic" not in k:
+                v = io_utils.get_image(k)
                 id = k
                 tank_name = k.split("_")[-1]
                 
@@ -73,7 +74,7 @@ class TitleScreen(screen.Screen):
                 else:
                     x += tank_x + pad_x
         
-        w, h = self.game.settings['width'], self.game.settings['height']
+        w, h = self.game.settings.width, self.game.settings.height
         tank_ui.center_component('title', 1, 0)
         self.tank_ui = tank_ui
         
@@ -90,7 +91,7 @@ class TitleScreen(screen.Screen):
                     self.set_state(TitleScreen.STATE_TANK_SELECT)
             elif event.type == MOUSEBUTTONUP:
                 if event.button == 1:
-                    c = self.settings_ui.get_component_at_pos(pygame.mouse.get_pos())
+                    c = self.settings_ui.get_component_at_pos(event.pos)
                     if c is not None:
                         if c.name.startswith('button_'):
                             self.difficulty = c.name.split('_')[-1]
@@ -103,7 +104,7 @@ class TitleScreen(screen.Screen):
                     self.start_playing()
             if event.type == MOUSEBUTTONUP:
                 if event.button == 1:
-                    c = self.tank_ui.get_component_at_pos(pygame.mouse.get_pos())
+                    c = self.tank_ui.get_component_at_pos(event.pos)
                     if c is not None:
                         if "tank_" in c.name:
                             tank_name = c.name.split("_")[-1]
@@ -0,0 +1,104 @@
+"""
+    tankeroidz.spatial
+    ~~~~~~~~~~~~~~~~~~
+
+    Broadphase collision helpers. Contains the SpatialHash class, a uniform
+    grid that narrows collision checks down to nearby game objects.
+"""
+import math
+
+class SpatialHash(object):
+    """A uniform grid of square cells keyed by their integer coordinates.
+
+    Each object is inserted into every cell that its bounding box (circle
+    position +/- radius) overlaps, so any two circles that collide are
+    guaranteed to share at least one cell. Cells are stored in a dictionary
+    rather than a fixed array, which means objects that sit on the map's edge
+    or have drifted off of it (e.g. a wall walking tank that wrapped to
+    `x == width`) are hashed like any other object.
+
+    Queries return candidates in insertion order so callers that depend on
+    list order (see PlayScreen.collision_system) resolve collisions exactly
+    like a brute-force loop over the original list would.
+
+    Attributes:
+        cell_size: The width and height of one cell in pixels.
+    """
+    def __init__(self, cell_size=32):
+        self.cell_size = float(cell_size)
+        self.clear()
+
+    def clear(self):
+        """Remove every object from the grid."""
+        self._cells = {}
+        self._entries = {} # object -> (insertion order, list of cell keys)
+        self._count = 0
+
+    def _cell_range(self, obj):
+        size, r = self.cell_size, obj.radius
+        x0 = int(math.floor((obj.x - r) / size))
+        x1 = int(math.floor((obj.x + r) / size))
+        y0 = int(math.floor((obj.y - r) / size))
+        y1 = int(math.floor((obj.y + r) / size))
+        return x0, x1, y0, y1
+
+    def insert(self, obj):
+        """Add an object with x, y and radius attributes to the grid."""
+        x0, x1, y0, y1 = self._cell_range(obj)
+        keys = []
+
+        for cx in xrange(x0, x1 + 1):
+            for cy in xrange(y0, y1 + 1):
+                key = cx, cy
+                cell = self._cells.get(key)
+                if cell is None:
+                    cell = self._cells[key] = []
+                cell.append(obj)
+                keys.append(key)
+
+        self._entries[obj] = self._count, keys
+        self._count += 1
+
+    def insert_all(self, objs):
+        """Add every object in the iterable to the grid."""
+        for obj in objs:
+            self.insert(obj)
+
+    def remove(self, obj):
+        """Remove an object from the grid. Unknown objects are ignored."""
+        entry = self._entries.pop(obj, None)
+        if entry is None:
+            return
+
+        for key in entry[1]:
+            cell = self._cells[key]
+            cell.remove(obj)
+            if not cell:
+                del self._cells[key]
+
+    def query(self, obj):
+        """Returns every object sharing a cell with the given circle, sorted
+        by insertion order. The circle itself is included if it's in the grid;
+        callers still need to run a narrowphase test such as
+        math_utils.circle_collision on the results."""
+        x0, x1, y0, y1 = self._cell_range(obj)
+        cells = self._cells
+        found = set()
+
+        for cx in xrange(x0, x1 + 1):
+            for cy in xrange(y0, y1 + 1):
+                cell = cells.get((cx, cy))
+                if cell:
+                    found.update(cell)
+
+        if len(found) < 2:
+            return list(found)
+
+        entries = self._entries
+        return sorted(found, key=lambda o: entries[o][0])
+
+    def __contains__(self, obj):
+        return obj in self._entries
+
+    def __len__(self):
+        return len(self._entries)
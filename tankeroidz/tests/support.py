@@ -0,0 +1,23 @@
+"""
+    tankeroidz.tests.support
+    ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Shared setup for the tests, which import the game's modules the same
+    way the game does. Import it before anything from the game. Run the
+    tests from the tankeroidz directory with:
+
+        python -m unittest discover -s tests
+"""
+import os
+import sys
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Nothing is shown or played while testing
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+# Resource paths are relative to the package, like when the game runs
+os.chdir(PACKAGE_DIR)
+if PACKAGE_DIR not in sys.path:
+    sys.path.insert(0, PACKAGE_DIR)
@@ -0,0 +1,167 @@
+import random
+import unittest
+
+import support
+import game
+import entity_store
+from screens import PlayScreen
+from arena import EntityArena
+
+class Thing(object):
+    def __init__(self, name):
+        self.name = name
+
+def names(entities):
+    return [entity.name for entity in entities]
+
+class EntityArenaTest(unittest.TestCase):
+    def setUp(self):
+        self.things = [Thing(name) for name in 'abcdef']
+        self.arena = EntityArena()
+        for thing in self.things:
+            self.arena.append(thing)
+
+    def test_iteration_skips_entities_killed_during_the_loop(self):
+        a, b, c, d, e, f = self.things
+        seen = []
+        for thing in self.arena:
+            seen.append(thing.name)
+            if thing is a: # Kill the next entity and one further on
+                self.arena.kill(b)
+                self.arena.kill(e)
+            if thing is c: # Killing the current entity mustn't skip d
+                self.arena.kill(c)
+
+        self.assertEqual(seen, list('acdf'))
+        self.assertEqual(len(self.arena), 3)
+        self.assertNotIn(b, self.arena)
+
+    def test_entities_appended_during_the_loop_are_visited(self):
+        extra = Thing('g')
+        seen = []
+        for thing in self.arena:
+            seen.append(thing.name)
+            if thing is self.things[0]:
+                self.arena.kill(self.things[1])
+                self.arena.append(extra)
+
+        self.assertEqual(seen, list('acdefg'))
+
+    def test_double_kill(self):
+        self.assertTrue(self.arena.kill(self.things[2]))
+        self.assertFalse(self.arena.kill(self.things[2]))
+        self.assertFalse(self.arena.kill(Thing('stranger')))
+        self.assertEqual(len(self.arena), 5)
+
+    def test_flush_keeps_order_and_returns_each_kill_once(self):
+        a, b, c, d, e, f = self.things
+        for thing in (e, a, c, e):
+            self.arena.kill(thing)
+
+        removed = self.arena.flush()
+
+        self.assertEqual(sorted(names(removed)), list('ace'))
+        self.assertEqual(names(self.arena), list('bdf'))
+        self.assertEqual([self.arena[i].name for i in range(3)], list('bdf'))
+        self.assertEqual(self.arena.flush(), [])
+
+        # Indices are rebuilt, so later kills hit the right entities
+        self.assertTrue(self.arena.kill(f))
+        self.assertEqual(names(self.arena.flush()), ['f'])
+        self.assertEqual(names(self.arena), list('bd'))
+
+    def test_flushed_entities_can_be_appended_again(self):
+        a = self.things[0]
+        self.arena.kill(a)
+        self.arena.flush()
+        self.assertNotIn(a, self.arena)
+
+        self.arena.append(a) # e.g. reused by a Pool
+        self.assertIn(a, self.arena)
+        self.assertEqual(names(self.arena), list('bcdefa'))
+
+@unittest.skipIf(entity_store.numpy is None, "NumPy isn't installed")
+class EntityStoreKillTest(unittest.TestCase):
+    def setUp(self):
+        self.store = entity_store.EntityStore()
+        self.views = []
+        for i in range(5):
+            thing = Thing(str(i))
+            thing.x = thing.y = thing.rot = thing.move_speed = float(i)
+            thing.radius, thing.health = 1, 1
+            self.views.append(self.store.append(thing))
+
+    def test_kill_and_flush(self):
+        store, views = self.store, self.views
+        seen = []
+        for view in store:
+            seen.append(view.name)
+            if view is views[0]:
+                self.assertTrue(store.kill(views[1]))
+                self.assertFalse(store.kill(views[1]))
+
+        self.assertEqual(seen, list('0234'))
+        self.assertEqual(names(store.flush()), ['1'])
+        self.assertEqual(names(store), list('0234'))
+        self.assertEqual(list(store.column('x')), [0.0, 2.0, 3.0, 4.0])
+
+    def test_kill_where(self):
+        store, views = self.store, self.views
+        store.kill(views[1])
+
+        mask = store.column('x') >= 1
+        self.assertEqual(store.kill_where(mask), 3) # 1 was already dead
+        self.assertEqual(list(store.alive()), [True] + [False] * 4)
+        self.assertEqual(names(store), ['0'])
+        self.assertEqual(len(store), 5) # Rows stay until the flush
+
+        self.assertEqual(names(store.flush()), list('1234'))
+        self.assertEqual(list(store.alive()), [True])
+
+@unittest.skipIf(entity_store.numpy is None, "NumPy isn't installed")
+class StorageModesTest(unittest.TestCase):
+    """PlayScreen kills the same way with list and array storage."""
+    def run_screen(self, array_entities, ticks=150):
+        random.seed(3)
+        play_game = game.Game(headless=True)
+        play_game.settings = play_game.settings.replace(
+            array_entities=array_entities)
+        screen = PlayScreen(play_game, tank='T34', difficulty='easy')
+        play_game.screen = screen
+        self.assertEqual(screen.array_entities, array_entities)
+        screen.tank.max_health = screen.tank.health = 10**9
+        screen.tank.bullet_fire_now, screen.tank.dir = True, 1
+
+        states = []
+        for i in xrange(ticks):
+            for j in xrange(5):
+                screen.spawn_enemy()
+
+            # Step through PlayScreen.update, checking the state mid-tick
+            for name in PlayScreen.SYSTEMS:
+                getattr(screen, name)()
+                if name == 'collision_system':
+                    # Nothing is removed before the end of the tick
+                    self.assertEqual(screen.despawned, [])
+                    states.append(self.state(screen))
+            screen.release_despawned()
+            screen.run_ticks += 1
+            screen.ticks += 1
+            states.append(self.state(screen))
+
+        return states
+
+    def state(self, screen):
+        positions = lambda entities: [(round(e.x, 6), round(e.y, 6))
+            for e in entities]
+        return (screen.score, screen.kills, positions(screen.enemies),
+            positions(screen.bullets), positions(screen.powerups))
+
+    def test_same_state_every_tick(self):
+        lists, arrays = self.run_screen(False), self.run_screen(True)
+        self.assertGreater(lists[-1][1], 0) # Something was killed
+        for i, (expected, state) in enumerate(zip(lists, arrays)):
+            self.assertEqual(state, expected, "differs at step " + str(i))
+
+if __name__ == '__main__':
+    unittest.main()
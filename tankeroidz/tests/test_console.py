@@ -0,0 +1,175 @@
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import subprocess
+import unittest
+
+import support
+import console
+from console import ConsoleRecord, IOConsole
+
+class RecordingConsole(console.Console):
+    def __init__(self, recording_level=0):
+        console.Console.__init__(self, recording_level)
+        self.messages = []
+
+    def post(self, message):
+        self.messages.append(message)
+
+class LoggingTest(unittest.TestCase):
+    def setUp(self):
+        console.flush()
+        self.consoles = console.CONSOLES[:]
+        self.recording = RecordingConsole()
+        console.CONSOLES[:] = [self.recording] # Keep the tests quiet
+
+    def tearDown(self):
+        console.flush()
+        console.CONSOLES[:] = self.consoles
+        console.set_level(console.TYPE_INFO)
+
+    def test_flush_hands_every_record_to_the_consoles(self):
+        for i in xrange(1000):
+            console.log("record " + str(i))
+        console.warn("careful")
+        console.error("broken", ValueError("bad"))
+        console.flush()
+
+        messages = self.recording.messages
+        self.assertEqual(messages[:1000],
+            ["record " + str(i) for i in xrange(1000)])
+        self.assertEqual(messages[1000:],
+            ["WARNING: careful", "ERROR: broken (bad)"])
+
+    def test_level(self):
+        console.set_level(console.TYPE_WARNING)
+        console.log("dropped")
+        console.warn("kept")
+        console.set_level(console.TYPE_INFO)
+        console.log("kept too")
+        console.flush()
+
+        self.assertEqual(self.recording.messages,
+            ["WARNING: kept", "kept too"])
+        self.assertEqual([str(r) for r in list(console.RECORDS)[-2:]],
+            ["WARNING: kept", "kept too"])
+
+    def test_console_recording_level(self):
+        self.recording.recording_level = console.TYPE_ERROR
+        console.warn("skipped")
+        console.error("shown")
+        console.flush()
+        self.assertEqual(self.recording.messages, ["ERROR: shown"])
+
+    def test_records_ring(self):
+        count = console.RECORDS_CAPACITY + 10
+        for i in xrange(count):
+            console.log(str(i))
+
+        records = list(console.RECORDS)
+        self.assertEqual(len(records), console.RECORDS_CAPACITY)
+        self.assertEqual(records[0].message, str(count -
+            console.RECORDS_CAPACITY))
+        self.assertEqual(records[-1].message, str(count - 1))
+
+    def test_close_stops_the_writer(self):
+        console.log("before")
+        writer = console._writer
+        self.assertTrue(writer.is_alive())
+
+        console.close()
+        self.assertFalse(writer.is_alive())
+        self.assertNotIn(writer, threading.enumerate())
+        self.assertEqual(self.recording.messages, ["before"])
+        console.close() # Nothing left to stop
+
+        # Logging again starts a new writer
+        console.log("after")
+        console.flush()
+        self.assertIsNot(console._writer, writer)
+        self.assertEqual(self.recording.messages, ["before", "after"])
+
+    def test_exit_stops_the_writer(self):
+        # Exit hooks run last registered first, so `check` runs after the
+        # hook that console registers on import
+        script = ("import atexit\n"
+            "def check(): assert not writer.is_alive(), 'writer alive'\n"
+            "atexit.register(check)\n"
+            "import console\n"
+            "for i in xrange(2000): console.log(str(i))\n"
+            "writer = console._writer\n")
+        process = subprocess.Popen([sys.executable, '-c', script],
+            cwd=support.PACKAGE_DIR, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE)
+        out, err = process.communicate()
+
+        self.assertEqual(process.returncode, 0)
+        self.assertEqual(err, '')
+        self.assertTrue(out.endswith("1999\n"), out[-50:]) # Nothing lost
+
+class IOConsoleTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'game.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def records(self, count, level=console.TYPE_INFO):
+        return [ConsoleRecord("record %03d" % i, level) for i in xrange(count)]
+
+    def read(self, path):
+        with open(path) as log_file:
+            return [line.split(' ', 2)[2] for line in log_file]
+
+    def test_writes_formatted_records(self):
+        io_console = IOConsole(self.path, recording_level=console.TYPE_WARNING)
+        io_console.log_batch(self.records(2) +
+            self.records(1, console.TYPE_ERROR))
+        io_console.log(ConsoleRecord("careful", console.TYPE_WARNING))
+        io_console.log_file = None
+
+        self.assertEqual(self.read(self.path),
+            ["ERROR: record 000\n", "WARNING: careful\n"])
+        self.assertFalse(os.path.exists(self.path + '.1'))
+
+    def test_rotation(self):
+        line_size = len(IOConsole().format(self.records(1)[0]))
+        max_bytes = line_size * 10 + 5
+        io_console = IOConsole(self.path, max_bytes=max_bytes, backups=2)
+
+        records = self.records(45)
+        io_console.log_batch(records[:25]) # Rotates mid-batch
+        for record in records[25:]:
+            io_console.log(record)
+        io_console.log_file = None
+
+        # Ten lines fit in each file; the oldest records rotated away
+        paths = [self.path + '.2', self.path + '.1', self.path]
+        for path in paths:
+            self.assertLessEqual(os.path.getsize(path), max_bytes)
+        self.assertFalse(os.path.exists(self.path + '.3'))
+        self.assertEqual(sum((self.read(path) for path in paths), []),
+            [str(record) + "\n" for record in records[20:]])
+
+    def test_long_line(self):
+        io_console = IOConsole(self.path, max_bytes=16, backups=1)
+        io_console.log_batch([ConsoleRecord("x" * 40), ConsoleRecord("y")])
+        io_console.log_file = None
+
+        # A line longer than max_bytes gets a file of its own
+        self.assertEqual(self.read(self.path + '.1'), ["x" * 40 + "\n"])
+        self.assertEqual(self.read(self.path), ["y\n"])
+
+    def test_no_backups(self):
+        io_console = IOConsole(self.path, max_bytes=1, backups=0)
+        io_console.log_batch(self.records(3))
+        io_console.log_file = None
+
+        self.assertEqual(os.listdir(self.dir), ['game.log'])
+        self.assertEqual(self.read(self.path), ["record 002\n"])
+
+if __name__ == '__main__':
+    unittest.main()
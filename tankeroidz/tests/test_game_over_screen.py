@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import support
+import game
+import run_history
+from screens import GameOverScreen
+
+@unittest.skipIf(run_history.sqlite3 is None, "sqlite3 isn't available")
+class GameOverStatsTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.history = run_history.RunHistory(os.path.join(self.dir, 'runs.db'))
+        for difficulty, score in (('hard', 150), ('hard', 40), ('easy', 900)):
+            self.history.record(difficulty=difficulty, tank='T34', ticks=600,
+                kills=3, powerups=1, score=score)
+
+        self.game = game.Game(headless=True)
+        self.game.persist_scores = False # Keep the score log out of it
+        self.screen = GameOverScreen(self.game, score=100, difficulty='hard',
+            tank='T34', ticks=600, kills=4, powerups=0)
+
+    def tearDown(self):
+        self.history.close()
+        shutil.rmtree(self.dir)
+
+    def texts(self):
+        return dict((name, self.screen.ui[name].text) for name in
+            ('max_score', 'min_score', 'avg_score', 'difficulty_best',
+            'difficulty_avg', 'runs_beaten'))
+
+    def test_difficulty_stats_get_their_own_labels(self):
+        before = self.texts()
+        self.assertEqual(before['difficulty_best'], "")
+        self.assertEqual(before['runs_beaten'], "")
+
+        self.game.run_history = self.history
+        self.screen.log_run()
+        self.history.flush()
+        self.screen.update()
+
+        after = self.texts()
+        # The all-time stats stay as they were
+        for name in ('max_score', 'min_score', 'avg_score'):
+            self.assertEqual(after[name], before[name])
+        # hard: 150, 40 and this run's 100
+        self.assertEqual(after['difficulty_best'], "Best on hard: 150")
+        self.assertEqual(after['difficulty_avg'], "Average on hard: 96")
+        self.assertEqual(after['runs_beaten'], "Runs beaten on hard: 33%")
+
+    def test_failed_query_shows_only_all_time_stats(self):
+        before = self.texts()
+        self.screen.pending_stats = query = run_history.Query()
+        query._resolve(None)
+        self.screen.update()
+
+        self.assertEqual(self.texts(), before)
+        self.assertEqual(self.screen.pending_stats, None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import pickle
+import unittest
+
+import support
+from entities import GameObject, Modifier
+
+class ModifierTest(unittest.TestCase):
+    def test_parse(self):
+        for spec, value, result in (('*1.5', 1.5, 15.0), ('+2', 2.0, 12.0),
+                ('-4', 4.0, 6.0), ('/2', 2.0, 5.0), ('3', 3.0, 3.0)):
+            modifier = Modifier(spec)
+            self.assertEqual(modifier.spec, spec)
+            self.assertEqual(modifier.value, value)
+            self.assertEqual(modifier.oper(10.0, modifier.value), result)
+
+    def test_pickle(self):
+        modifier = pickle.loads(pickle.dumps(Modifier('7')))
+        self.assertEqual(modifier.spec, '7')
+        self.assertEqual(modifier.oper(10.0, modifier.value), 7.0)
+
+class StatModifiersTest(unittest.TestCase):
+    def setUp(self):
+        self.unit = GameObject()
+        self.unit.move_speed = 10.0
+
+    def test_stacking_and_removal_by_source(self):
+        unit = self.unit
+        unit.add_modifier('speed', 'move_speed', Modifier('*2'))
+        unit.add_modifier('boots', 'move_speed', Modifier('+5'))
+        self.assertEqual(unit.move_speed, 25.0)
+
+        # Same source replaces its modifier, which goes on top of the stack
+        unit.add_modifier('speed', 'move_speed', Modifier('*3'))
+        self.assertEqual(unit.move_speed, 45.0)
+
+        unit.remove_modifier('speed')
+        self.assertEqual(unit.move_speed, 15.0)
+        unit.remove_modifier('speed') # Nothing left from that source
+        unit.remove_modifier('boots')
+        self.assertEqual(unit.move_speed, 10.0)
+        self.assertEqual(unit.base_stats, {})
+
+if __name__ == '__main__':
+    unittest.main()
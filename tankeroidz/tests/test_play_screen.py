@@ -0,0 +1,36 @@
+import unittest
+
+import support
+import game
+from screens import PlayScreen
+
+class SystemsTest(unittest.TestCase):
+    def setUp(self):
+        self.game = game.Game(headless=True)
+        self.screen = PlayScreen(self.game, tank='T34', difficulty='easy')
+        self.game.screen = self.screen
+
+        # Record the systems' calls instead of running them
+        self.calls = []
+        for name in PlayScreen.SYSTEMS:
+            setattr(self.screen, name,
+                lambda name=name: self.calls.append(name))
+
+    def test_update_runs_the_systems_in_order(self):
+        self.screen.update()
+        self.assertEqual(self.calls, list(PlayScreen.SYSTEMS))
+
+    def test_profiled_update_runs_the_same_systems(self):
+        self.screen.toggle_profiler()
+        self.screen.update()
+        self.assertEqual(self.calls, list(PlayScreen.SYSTEMS))
+        self.assertEqual(self.screen.profiler.stages,
+            list(PlayScreen.SYSTEMS))
+
+    def test_paused_update_runs_no_systems(self):
+        self.screen.set_state(self.screen.STATE_PAUSED)
+        self.screen.update()
+        self.assertEqual(self.calls, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import support
+import pygame
+from pygame.locals import *
+
+import game
+import replay
+from screens import TitleScreen, PlayScreen
+
+TICKS = 600
+
+# tick -> (event type, key) posted as if the player pressed them: pick the
+# tank and difficulty on the title screen, then drive, shoot and pause
+SCRIPT = {
+    2: [(KEYDOWN, K_SPACE)],
+    5: [(KEYDOWN, K_SPACE)],
+    8: [(KEYDOWN, K_SPACE)],
+    12: [(KEYDOWN, K_SPACE), (KEYDOWN, K_d)],
+    200: [(KEYUP, K_d), (KEYDOWN, K_w)],
+    300: [(KEYDOWN, K_a)],
+    350: [(KEYDOWN, K_p)],
+    370: [(KEYDOWN, K_p)],
+    500: [(KEYUP, K_w)]
+}
+
+def digest(game_):
+    """A summary of the game's state that two runs must agree on."""
+    screen = game_.screen
+    if not isinstance(screen, PlayScreen):
+        return game_.ticks, type(screen).__name__
+
+    tank = screen.tank
+    return (game_.ticks, screen.run_ticks, screen.score, screen.kills,
+        round(tank.x, 6), round(tank.y, 6), round(tank.health, 6),
+        tuple((round(e.x, 6), round(e.y, 6)) for e in screen.enemies),
+        tuple((round(b.x, 6), round(b.y, 6)) for b in screen.bullets),
+        tuple(p.name for p in screen.powerups))
+
+def new_game():
+    game_ = game.Game(headless=True)
+    game_.set_screen(TitleScreen(game_))
+    game_.ticks = 0
+    return game_
+
+class ReplayTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.dir, 'session.rep')
+
+        # Record a scripted session, noting the state at every tick
+        recorded = new_game()
+        recorded.recorder = replay.Recorder(cls.path, seed=1234,
+            keyframe_interval=100)
+        recorded.recorder.start()
+
+        cls.digests = {}
+        while recorded.ticks < TICKS:
+            for type_, key in SCRIPT.get(recorded.ticks, []):
+                pygame.event.post(pygame.event.Event(type_, key=key, mod=0))
+            recorded.process_input()
+            recorded.update()
+            cls.digests[recorded.ticks] = digest(recorded)
+        recorded.recorder.save()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.dir)
+
+    def player_game(self):
+        game_ = new_game()
+        game_.player = replay.Player(self.path)
+        game_.player.start()
+        return game_
+
+    def test_recorded_session_reached_play(self):
+        final = self.digests[TICKS]
+        self.assertEqual(len(final), 10, final)
+        self.assertGreater(final[2], 0) # Scored something
+
+    def test_playback_matches_recording(self):
+        game_ = self.player_game()
+        while game_.ticks < TICKS:
+            game_.process_input()
+            game_.update()
+            self.assertEqual(digest(game_), self.digests[game_.ticks])
+
+    def test_seek_to_keyframe_matches_playing_from_the_start(self):
+        for tick in (300, 450): # On a keyframe and between keyframes
+            game_ = self.player_game()
+            game_.player.seek(game_, tick, PlayScreen.from_snapshot)
+            self.assertEqual(digest(game_), self.digests[tick])
+
+            # And it carries on exactly like the recording
+            while game_.ticks < TICKS:
+                game_.process_input()
+                game_.update()
+            self.assertEqual(digest(game_), self.digests[TICKS])
+
+    def test_file_header(self):
+        player = replay.Player(self.path)
+        self.assertEqual(player.seed, 1234)
+        self.assertEqual(player.keyframe_interval, 100)
+        self.assertEqual([kf.tick for kf in player.keyframes],
+            range(100, TICKS + 1, 100))
+
+if __name__ == '__main__':
+    unittest.main()
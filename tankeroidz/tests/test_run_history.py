@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import support
+import run_history
+
+RUNS = [
+    # difficulty, tank, ticks, kills, powerups, score
+    ('hard', 'classic', 900, 12, 2, 150),
+    ('hard', 'T34', 300, 3, 0, 40),
+    ('hard', 'classic', 1200, 20, 5, 260),
+    ('easy', 'T34', 600, 8, 1, 90),
+    ('hard', 'T34', 450, 6, 1, 75),
+]
+
+@unittest.skipIf(run_history.sqlite3 is None, "sqlite3 isn't available")
+class RunHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.history = run_history.RunHistory(
+            os.path.join(self.dir, 'runs.db'))
+        for run in RUNS:
+            self.history.record(**dict(zip(run_history.RUN_FIELDS, run)))
+
+    def tearDown(self):
+        self.history.close()
+        shutil.rmtree(self.dir)
+
+    def test_flush_waits_for_queued_queries(self):
+        query = self.history.stats('hard')
+        self.history.flush()
+        self.assertTrue(query.ready)
+
+    def test_stats(self):
+        hard = self.history.stats('hard').wait(5)
+        self.assertEqual((hard.count, hard.total, hard.min, hard.max),
+            (4, 525, 40, 260))
+        self.assertEqual(hard.avg, 525 / 4.0)
+
+        none = self.history.stats('insane').wait(5)
+        self.assertEqual((none.count, none.min, none.avg), (0, None, None))
+
+    def test_count_below_and_percentile(self):
+        history = self.history
+        self.assertEqual(history.count_below(100).wait(5), 3)
+        self.assertEqual(history.count_below(100, 'hard').wait(5), 2)
+        self.assertEqual(history.count_below(100, 'hard', 'T34').wait(5), 2)
+        self.assertEqual(history.count_below(40, 'hard').wait(5), 0)
+
+        self.assertEqual(history.percentile(100, 'hard').wait(5), 50.0)
+        self.assertEqual(history.percentile(100, 'insane').wait(5), None)
+
+    def test_top(self):
+        top = self.history.top(2, 'hard').wait(5)
+        self.assertEqual([run['score'] for run in top], [260, 150])
+        self.assertEqual(top[0], dict(zip(run_history.RUN_FIELDS, RUNS[2])))
+
+        t34 = self.history.top(10, tank='T34').wait(5)
+        self.assertEqual([run['score'] for run in t34], [90, 75, 40])
+
+    def test_queries_see_the_runs_recorded_before_them(self):
+        self.history.record(difficulty='hard', tank='classic', ticks=30,
+            kills=0, powerups=0, score=5)
+        stats, beaten = self.history.summary('hard', 5).wait(5)
+        self.assertEqual((stats.count, stats.min), (5, 5))
+        self.assertEqual(beaten, 0)
+
+    def test_runs_persist(self):
+        self.history.close()
+        self.history = run_history.RunHistory(self.history.path)
+        self.assertEqual(self.history.stats('easy').wait(5).count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
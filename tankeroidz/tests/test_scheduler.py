@@ -0,0 +1,152 @@
+import pickle
+import unittest
+
+import support
+from scheduler import Scheduler
+
+class Owner(object):
+    """Records every handler call as a (tick, name, args) tuple."""
+    def __init__(self):
+        self.calls = []
+        self.scheduler = Scheduler(self)
+
+    def ping(self, *args):
+        self.calls.append((self.scheduler.tick, 'ping', args))
+
+    def pong(self, *args):
+        self.calls.append((self.scheduler.tick, 'pong', args))
+
+    def stop(self, key):
+        self.calls.append((self.scheduler.tick, 'stop', (key,)))
+        self.scheduler.cancel(key)
+
+class SchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.owner = Owner()
+        self.scheduler = self.owner.scheduler
+
+    def advance(self, ticks):
+        for i in xrange(ticks):
+            self.scheduler.advance()
+
+    def test_one_shot(self):
+        self.scheduler.schedule(3, 'ping', (1,))
+        self.advance(3)
+        self.assertEqual(self.owner.calls, [])
+        self.advance(1)
+        self.assertEqual(self.owner.calls, [(3, 'ping', (1,))])
+        self.advance(10)
+        self.assertEqual(len(self.owner.calls), 1)
+        self.assertEqual(len(self.scheduler), 0)
+
+    def test_zero_delay_runs_on_the_current_tick(self):
+        self.advance(5)
+        self.scheduler.schedule(0, 'ping')
+        self.scheduler.schedule(-2, 'pong') # Clamped to now
+        self.advance(1)
+        self.assertEqual(self.owner.calls, [(5, 'ping', ()), (5, 'pong', ())])
+
+    def test_due_order(self):
+        for delay, arg in ((5, 'a'), (1, 'b'), (3, 'c'), (1, 'd'), (5, 'e')):
+            self.scheduler.schedule(delay, 'ping', (arg,))
+        self.advance(6)
+        # By due tick, then in the order they were scheduled
+        self.assertEqual(self.owner.calls, [(1, 'ping', ('b',)),
+            (1, 'ping', ('d',)), (3, 'ping', ('c',)), (5, 'ping', ('a',)),
+            (5, 'ping', ('e',))])
+
+    def test_repeating(self):
+        self.scheduler.every(4, 'ping', delay=2)
+        self.scheduler.every(3, 'pong')
+        self.advance(12)
+        self.assertEqual([c for c in self.owner.calls if c[1] == 'ping'],
+            [(2, 'ping', ()), (6, 'ping', ()), (10, 'ping', ())])
+        self.assertEqual([c for c in self.owner.calls if c[1] == 'pong'],
+            [(0, 'pong', ()), (3, 'pong', ()), (6, 'pong', ()),
+            (9, 'pong', ())])
+        # A repeat that falls on the same tick as another timer keeps its
+        # place behind timers scheduled before it repeated
+        self.assertEqual(self.owner.calls[3:5], [(6, 'ping', ()),
+            (6, 'pong', ())])
+        self.assertEqual(len(self.scheduler), 2)
+
+    def test_interval_must_be_positive(self):
+        self.assertRaises(ValueError, self.scheduler.every, 0, 'ping')
+        self.assertRaises(ValueError, self.scheduler.schedule, 1, 'ping',
+            interval=-1)
+        self.assertEqual(len(self.scheduler), 0)
+
+    def test_cancel(self):
+        self.scheduler.schedule(2, 'ping', key='shot')
+        self.scheduler.every(1, 'pong', key='tick')
+        self.advance(2)
+        self.scheduler.cancel('shot')
+        self.scheduler.cancel('tick')
+        self.scheduler.cancel('missing')
+        self.advance(5)
+        self.assertEqual(self.owner.calls, [(0, 'pong', ()), (1, 'pong', ())])
+        self.assertEqual(len(self.scheduler), 0)
+
+    def test_cancel_from_handler(self):
+        self.scheduler.every(2, 'ping', key='tick')
+        self.scheduler.schedule(5, 'stop', ('tick',))
+        self.advance(10)
+        self.assertEqual(self.owner.calls, [(0, 'ping', ()), (2, 'ping', ()),
+            (4, 'ping', ()), (5, 'stop', ('tick',))])
+
+    def test_repeating_timer_cancels_itself(self):
+        self.scheduler.every(3, 'stop', ('self',), key='self')
+        self.advance(10)
+        self.assertEqual(self.owner.calls, [(0, 'stop', ('self',))])
+        self.assertEqual(self.scheduler.remaining('self'), None)
+
+    def test_key_replaces(self):
+        self.scheduler.schedule(3, 'ping', (1,), key='buff')
+        self.advance(2)
+        self.scheduler.schedule(3, 'ping', (2,), key='buff') # Refreshed
+        self.assertEqual(self.scheduler.remaining('buff'), 3)
+        self.advance(10)
+        self.assertEqual(self.owner.calls, [(5, 'ping', (2,))])
+        self.assertEqual(self.scheduler.remaining('buff'), None)
+
+    def test_remaining(self):
+        self.scheduler.every(5, 'ping', delay=3, key='tick')
+        self.assertEqual(self.scheduler.remaining('tick'), 3)
+        self.advance(3)
+        self.assertEqual(self.scheduler.remaining('tick'), 0)
+        self.advance(1)
+        self.assertEqual(self.scheduler.remaining('tick'), 4)
+        self.assertEqual(self.scheduler.remaining('missing'), None)
+
+    def test_pause_by_not_advancing(self):
+        self.scheduler.schedule(2, 'ping', key='shot')
+        self.advance(1)
+        # Paused: however much time passes, nothing moves or fires
+        self.assertEqual(self.owner.calls, [])
+        self.assertEqual(self.scheduler.remaining('shot'), 1)
+        self.assertEqual(self.scheduler.tick, 1)
+        self.advance(2)
+        self.assertEqual(self.owner.calls, [(2, 'ping', ())])
+
+    def test_state_round_trip(self):
+        self.scheduler.every(3, 'ping', key='tick')
+        self.scheduler.schedule(4, 'pong', (7,))
+        self.scheduler.schedule(2, 'pong', key='gone')
+        self.scheduler.cancel('gone')
+        self.advance(2)
+        state = pickle.loads(pickle.dumps(self.scheduler.get_state()))
+
+        # Run on, then rewind a fresh owner and the original to the state
+        self.advance(8)
+        expected = self.owner.calls[1:]
+        for owner in (Owner(), self.owner):
+            owner.calls = []
+            owner.scheduler.set_state(state)
+            self.assertEqual(len(owner.scheduler), 2)
+            self.assertEqual(owner.scheduler.remaining('tick'), 1)
+            for i in xrange(8):
+                owner.scheduler.advance()
+            self.assertEqual(owner.calls, expected)
+
+if __name__ == '__main__':
+    unittest.main()
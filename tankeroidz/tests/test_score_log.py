@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import support
+import score_log
+from score_log import ScoreLog, RECORD, HEADER
+
+class ScoreLogTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'scores.log')
+        self.header_path = os.path.join(self.dir, 'scores.hdr')
+        self.legacy_path = os.path.join(self.dir, 'scores.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def open_log(self):
+        return ScoreLog(self.path, self.header_path, self.legacy_path)
+
+    def assertStats(self, stats, count, total, min_, max_):
+        self.assertEqual((stats.count, stats.total, stats.min, stats.max),
+            (count, total, min_, max_))
+
+    def test_fresh_log(self):
+        log = self.open_log()
+        self.assertStats(log.stats, 0, 0, None, None)
+        self.assertEqual(log.stats.avg, None)
+        self.assertEqual(list(log.scores()), [])
+
+    def test_append(self):
+        log = self.open_log()
+        for score in (50, 20, 80):
+            stats = log.append(score)
+        self.assertStats(stats, 3, 150, 20, 80)
+        self.assertEqual(stats.avg, 50.0)
+
+        self.assertEqual(os.path.getsize(self.path), 3 * RECORD.size)
+        self.assertEqual(os.path.getsize(self.header_path), HEADER.size)
+        self.assertStats(log.read_header(), 3, 150, 20, 80)
+        self.assertEqual(list(log.scores()), [50, 20, 80])
+        self.assertEqual(list(log.scores(1)), [20, 80])
+
+        # Reopening reads the header rather than the records
+        self.assertStats(self.open_log().stats, 3, 150, 20, 80)
+
+    def test_migration(self):
+        with open(self.legacy_path, 'w') as legacy_file:
+            legacy_file.write('120\n30\n\n75\n')
+
+        log = self.open_log()
+        self.assertStats(log.stats, 3, 225, 30, 120)
+        self.assertEqual(list(log.scores()), [120, 30, 75])
+        self.assertStats(log.read_header(), 3, 225, 30, 120)
+
+        # Only imported while there's no log
+        log.append(5)
+        self.assertStats(self.open_log().stats, 4, 230, 5, 120)
+
+    def test_header_behind_log(self):
+        log = self.open_log()
+        log.append(40)
+        header = open(self.header_path, 'rb').read()
+        log.append(90)
+        log.append(10)
+
+        # As if the game was killed after writing the records but before
+        # writing the header
+        with open(self.header_path, 'wb') as header_file:
+            header_file.write(header)
+        log = self.open_log()
+        self.assertStats(log.stats, 3, 140, 10, 90)
+        self.assertStats(log.read_header(), 3, 140, 10, 90)
+
+    def test_header_ahead_of_log(self):
+        log = self.open_log()
+        for score in (40, 90, 10):
+            log.append(score)
+
+        # The header covers records the log doesn't have: rebuilt from the log
+        with open(self.path, 'r+b') as log_file:
+            log_file.truncate(2 * RECORD.size)
+        log = self.open_log()
+        self.assertStats(log.stats, 2, 130, 40, 90)
+        self.assertStats(log.read_header(), 2, 130, 40, 90)
+
+    def test_partial_record(self):
+        log = self.open_log()
+        log.append(40)
+        log.append(90)
+
+        # A record cut off halfway is dropped
+        with open(self.path, 'ab') as log_file:
+            log_file.write(RECORD.pack(70)[:3])
+        log = self.open_log()
+        self.assertStats(log.stats, 2, 130, 40, 90)
+        self.assertEqual(os.path.getsize(self.path), 2 * RECORD.size)
+
+        log.append(70)
+        self.assertEqual(list(log.scores()), [40, 90, 70])
+
+    def test_unreadable_header(self):
+        log = self.open_log()
+        log.append(40)
+        log.append(90)
+
+        for data in ('', 'junk', HEADER.pack('XXXX', score_log.VERSION,
+                2, 130, 40, 90)):
+            with open(self.header_path, 'wb') as header_file:
+                header_file.write(data)
+            log = self.open_log()
+            self.assertStats(log.stats, 2, 130, 40, 90)
+            self.assertStats(log.read_header(), 2, 130, 40, 90) # Rewritten
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import random
+import unittest
+
+import support
+from spatial import SpatialHash
+from math_utils import circle_collision
+
+class Circle(object):
+    def __init__(self, x, y, radius):
+        self.x, self.y, self.radius = x, y, radius
+
+    def __repr__(self):
+        return "Circle(%r, %r, %r)" % (self.x, self.y, self.radius)
+
+CELL = 32
+
+def random_circles(rng, count):
+    circles = []
+    for i in xrange(count):
+        kind = rng.random()
+        if kind < .2: # Exactly on cell borders and corners
+            x = rng.randint(-2, 12) * CELL
+            y = rng.randint(-2, 12) * CELL
+        else: # Anywhere, including off the map
+            x = rng.uniform(-40, 400)
+            y = rng.uniform(-40, 400)
+
+        if kind > .9: # Bigger than a cell
+            radius = rng.uniform(CELL, 3 * CELL)
+        elif kind > .8:
+            radius = 0
+        else:
+            radius = rng.uniform(1, CELL / 2.0)
+        circles.append(Circle(x, y, radius))
+
+    # Touching exactly across a cell border
+    circles.append(Circle(CELL - 3, 10, 3))
+    circles.append(Circle(CELL + 3, 10, 3))
+    return circles
+
+def brute_force_pairs(circles):
+    pairs = set()
+    for i, a in enumerate(circles):
+        for b in circles[i+1:]:
+            if circle_collision(a, b):
+                pairs.add(frozenset((id(a), id(b))))
+    return pairs
+
+def grid_pairs(grid, circles):
+    pairs = set()
+    for a in circles:
+        for b in grid.query(a):
+            if a is not b and circle_collision(a, b):
+                pairs.add(frozenset((id(a), id(b))))
+    return pairs
+
+class SpatialHashTest(unittest.TestCase):
+    def test_same_pairs_as_brute_force(self):
+        rng = random.Random(301)
+        for trial in xrange(20):
+            circles = random_circles(rng, 150)
+            grid = SpatialHash(CELL)
+            grid.insert_all(circles)
+
+            expected = brute_force_pairs(circles)
+            self.assertTrue(expected)
+            self.assertEqual(grid_pairs(grid, circles), expected,
+                "trial %d" % trial)
+
+    def test_query_is_in_insertion_order(self):
+        rng = random.Random(7)
+        circles = random_circles(rng, 200)
+        grid = SpatialHash(CELL)
+        grid.insert_all(circles)
+
+        order = dict((id(c), i) for i, c in enumerate(circles))
+        for circle in circles:
+            found = [order[id(c)] for c in grid.query(circle)]
+            self.assertEqual(found, sorted(found))
+            self.assertIn(order[id(circle)], found)
+
+    def test_removed_objects_are_not_found(self):
+        circles = [Circle(10, 10, 5), Circle(12, 12, 5), Circle(60, 10, 40)]
+        grid = SpatialHash(CELL)
+        grid.insert_all(circles)
+
+        grid.remove(circles[1])
+        grid.remove(Circle(0, 0, 1)) # Unknown objects are ignored
+
+        self.assertEqual(grid.query(circles[0]), [circles[0], circles[2]])
+        self.assertNotIn(circles[1], grid)
+        self.assertEqual(len(grid), 2)
+
+if __name__ == '__main__':
+    unittest.main()
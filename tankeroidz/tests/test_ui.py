@@ -0,0 +1,55 @@
+import unittest
+
+import support
+import pygame
+
+import ui
+
+class HitIndexTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pygame.display.init()
+        pygame.display.set_mode((320, 240))
+
+    def setUp(self):
+        self.clicks = []
+        self.ui = ui.UI(size=(320, 240))
+        self.ui["BACK"] = ui.Button(x=0, y=0, width=320, height=240)
+        self.ui["PLAY"] = ui.Button(x=100, y=100, width=50, height=20,
+            on_click=lambda: self.clicks.append("PLAY"))
+        self.ui["CURSOR"] = ui.Cursor()
+
+    def test_topmost_component(self):
+        self.assertIs(self.ui.get_component_at_pos((120, 110)),
+            self.ui["PLAY"])
+        self.assertIs(self.ui.get_component_at_pos(x=10, y=10),
+            self.ui["BACK"])
+        self.assertIs(self.ui.get_component_at_pos((400, 10)), None)
+
+    def test_cursor_isnt_hit(self):
+        cursor = self.ui["CURSOR"]
+        self.assertIs(self.ui.get_component_at_pos((cursor.x, cursor.y)),
+            self.ui["BACK"])
+
+    def test_moving_the_cursor_keeps_the_index(self):
+        index = self.ui.hit_index
+        cursor = self.ui["CURSOR"]
+        cursor.x, cursor.y = 120, 110
+        self.assertIs(self.ui.hit_index, index)
+
+        # Other components do move in it
+        self.ui["PLAY"].x = 200
+        self.assertIsNot(self.ui.hit_index, index)
+        self.assertIs(self.ui.get_component_at_pos((210, 110)),
+            self.ui["PLAY"])
+
+    def test_cursor_clicks_component_under_it(self):
+        cursor = self.ui["CURSOR"]
+        cursor.x, cursor.y = 120, 110
+        cursor.pressed = True
+        self.ui.touch_cursor()
+        self.assertEqual(self.clicks, ["PLAY"])
+        self.assertFalse(cursor.pressed)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
+import collections
+
 import pygame
 import io_utils
-import math_utils
 
 from pygame.locals import *
 
@@ -10,6 +11,45 @@ fonts = {
     'default': ["resources/fonts/FredokaOne.ttf", 16]
 }
 
+# Loaded pygame Fonts, keyed by (font name, size)
+font_cache = {}
+
+# Rendered text, least recently used first; keyed by (text, font name, size,
+# color) with (surface, bounding rect) values
+text_cache = collections.OrderedDict()
+text_cache_limit = 256
+
+def get_font(font, size):
+    """Returns the pygame Font for a font name in `fonts` and a size, loading
+    it from disk only the first time."""
+    key = font, size
+    f = font_cache.get(key)
+    if f is None:
+        f = font_cache[key] = pygame.font.Font(fonts[font][0], size)
+    return f
+    
+def render_text(text, font, size, color):
+    """Renders antialiased text, reusing the result for repeated text.
+    
+    The returned surface is shared between callers and must not be drawn on.
+    
+    Returns:
+        A (surface, bounding rect) tuple, where the bounding rect is the
+        surface's `get_bounding_rect()`.
+    """
+    key = text, font, size, tuple(color)
+    entry = text_cache.pop(key, None)
+    
+    if entry is None:
+        surface = get_font(font, size).render(text, 1, color)
+        entry = surface, surface.get_bounding_rect()
+        
+        if len(text_cache) >= text_cache_limit: # Evict the oldest text
+            text_cache.popitem(last=False)
+            
+    text_cache[key] = entry
+    return entry
+
 #TODO CHECK IF SETTER IS ..
 
 class UI(object):
@@ -17,10 +57,13 @@ class UI(object):
     as an interface.
     
     Attributes:
-        components: List of all UI components belonging to this UI.
+        components: List of all UI components belonging to this UI, in the
+            order they're rendered (bottom layer first).
     """
     def __init__(self, *args, **kwargs):
         self.components = []
+        self._by_name = {} # component name -> component
+        self._hit_index = None # built on demand (see UI.hit_index)
         self.listening = False
         
         self.width, self.height = -1, -1
@@ -38,10 +81,9 @@ class UI(object):
         
     def handle_input(self, event):
         """Handles input from the mouse and keyboard."""
-        if self["CURSOR"] is None:
-            return
-            
         cursor = self["CURSOR"]
+        if cursor is None:
+            return
             
         if event.type == KEYDOWN:
             if event.key in [K_DOWN, K_s]:
@@ -62,12 +104,13 @@ class UI(object):
                 cursor.pressed = True
             
     def update(self):
-        if self["CURSOR"] is None:
+        cursor = self["CURSOR"]
+        if cursor is None:
             return
             
         # Move the cursor
-        self["CURSOR"].x += self["CURSOR"].dx * self["CURSOR"].sensitivity
-        self["CURSOR"].y += self["CURSOR"].dy * self["CURSOR"].sensitivity
+        cursor.x += cursor.dx * cursor.sensitivity
+        cursor.y += cursor.dy * cursor.sensitivity
         
         # Click the cursor
         self.touch_cursor()
@@ -75,21 +118,16 @@ class UI(object):
         #self.move_cursor()
 
     def touch_cursor(self):
-        if self["CURSOR"] is None or not self["CURSOR"].pressed:
+        cursor = self["CURSOR"]
+        if cursor is None or not cursor.pressed:
             return
             
-        cursor = self["CURSOR"]
         
-        # Use a reverse loop here so that UI components with higher indices
-        # are favored - those are the components that are rendered last and
-        # therefore the "top layers"
-        for i in range(len(self.components)-1, -1, -1):
-            component = self.components[i]
-            if io_utils.point_in_rect(cursor, component) and component != cursor:
-                print "CLICKED", component.name, component.on_click
-                if component.on_click is not None:
-                    component.on_click()
-                break
+        component = self.hit_index.component_at(cursor.x, cursor.y)
+        if component is not None:
+            print "CLICKED", component.name, component.on_click
+            if component.on_click is not None:
+                component.on_click()
         
         cursor.pressed = False
         
@@ -106,7 +144,7 @@ class UI(object):
             ValueError
         """
         if 'x' in kwargs and 'y' in kwargs:
-            x, y = kwargs.x, kwargs.y
+            x, y = kwargs['x'], kwargs['y']
         elif len(args) > 0 and len(args[0]) > 1:
             x, y = args[0]
         else:
@@ -114,15 +152,18 @@ class UI(object):
                 " must be either a tuple or kwargs containing x- and y-values.")
             raise ValueError(msg)
 
-        # Use a reverse loop here so that UI components with higher indices
-        # are favored - those are the components that are rendered last and
-        # therefore the "top layers"
-        for i in range(len(self.components)-1, -1, -1):
-            component = self.components[i]
-            if math_utils.point_in_rect((x, y), component): #TODO
-                return component
-                
-        return None
+        return self.hit_index.component_at(x, y)
+        
+    @property
+    def hit_index(self):
+        """The HitIndex of the current component bounds. It's rebuilt after a
+        component is added, removed, moved or resized."""
+        if self._hit_index is None:
+            self._hit_index = HitIndex(self.components)
+        return self._hit_index
+        
+    def invalidate_hit_index(self):
+        self._hit_index = None
         
     def center_component(self, component, adjust_x=True, adjust_y=True):
         """Centers the component in the UI."""
@@ -133,8 +174,8 @@ class UI(object):
         if adjust_y: component.y = (self.height - component.height) / 2
                 
     def render(self, surface):
-        for components in self.components:
-            components.render(surface)
+        """Renders every component. Returns the list of rects drawn."""
+        return [component.render(surface) for component in self.components]
     
     def add(self, name, component):
         self[name] = component
@@ -144,13 +185,14 @@ class UI(object):
         return self[name]
         
     def remove(self, key):
-        self.components.remove(key)
+        del self[key]
     
     def index(self, key):
-        for i in range(self.components):
-            if self.components[i].name == key:
-                return i
-        raise ValueError(key + " not found in " + self + ".")
+        """Returns the z-index (position in `self.components`) of the named
+        component."""
+        if key not in self._by_name:
+            raise ValueError(str(key) + " not found in UI.")
+        return self.components.index(self._by_name[key])
     
     def contains(self, key):
         return key in self
@@ -163,30 +205,111 @@ class UI(object):
             self.remove(key)
             
         value.name = key
+        value.manager = self
         self.components.append(value)
+        self._by_name[key] = value
+        self._hit_index = None
         
         return value
     
     def __getitem__(self, key):
-        for component in self.components:
-            if component.name == key:
-                return component
+        return self._by_name.get(key)
     
     def __contains__(self, key):
-        for i in range(len(self.components)):
-            if self.components[i].name == key:
-                return True
-        return False
+        return key in self._by_name
         
     def __iter__(self):
         for c in self.components:
             yield c
 
     def __delitem__(self, key):
-        if type(key) is not int:
-           key = self.index(key)
-       
-        del self.components[key]
+        if type(key) is int:
+            component = self.components.pop(key)
+            del self._by_name[component.name]
+        else:
+            if key not in self._by_name:
+                raise KeyError(key)
+            component = self._by_name.pop(key)
+            self.components.remove(component)
+            
+        component.manager = None
+        self._hit_index = None
+
+class HitIndex(object):
+    """A uniform grid over the bounds of UI components for finding the
+    topmost component at a point without testing every component.
+    
+    Every cell lists the components overlapping it from the top layer (the
+    last rendered) down, so the first match in a cell is the topmost hit.
+    The index doesn't track changes; UI rebuilds it when bounds change.
+    Components that aren't hittable (e.g. the cursor) are left out.
+    
+    Attributes:
+        cell_size: The width and height of one cell in pixels.
+    """
+    def __init__(self, components, cell_size=64):
+        self.cell_size = cell_size
+        self._cells = {}
+        
+        for component in reversed(components):
+            if not component.hittable:
+                continue
+                
+            left, top = component.x, component.y
+            right = left + (component.width or 0)
+            bottom = top + (component.height or 0)
+            entry = (left, top, right, bottom), component
+            
+            for cx in xrange(int(left // cell_size),
+                    int(right // cell_size) + 1):
+                for cy in xrange(int(top // cell_size),
+                        int(bottom // cell_size) + 1):
+                    self._cells.setdefault((cx, cy), []).append(entry)
+                    
+    def component_at(self, x, y):
+        """Returns the topmost component whose bounds contain the point
+        (edges included), or None if there is none."""
+        cell = self._cells.get((int(x // self.cell_size),
+            int(y // self.cell_size)))
+            
+        for (left, top, right, bottom), component in cell or ():
+            if left <= x <= right and top <= y <= bottom:
+                return component
+        return None
+
+class UIProperty(object):
+    """A UIObject attribute that requests a redraw when it's changed.
+    
+    UIProperty only defines __set__, so it's a data descriptor that sees
+    every assignment while reads fall through to the instance dictionary at
+    normal attribute speed. Assigning the current value again does nothing.
+    
+    Attributes:
+        name: The attribute's name.
+        redraw: If True, a change rebuilds the component's surface. If False,
+            only the parent (which the component is drawn onto) is redrawn.
+        bounds: If True, a change moves the component in its UI's HitIndex.
+    """
+    def __init__(self, name, redraw=True, bounds=False):
+        self.name = name
+        self.redraw = redraw
+        self.bounds = bounds
+        
+    def __set__(self, obj, value):
+        values = obj.__dict__
+        name = self.name
+        
+        if name in values:
+            if values[name] == value: # no need to redraw if nothing changes
+                return
+            if self.redraw:
+                obj.redraw()
+            elif obj.parent is not None:
+                obj.parent.redraw()
+                
+        values[name] = value
+        if self.bounds and obj.hittable and obj.manager is not None:
+            obj.manager.invalidate_hit_index()
 
 class UIObject(object):
     """A renderable UI object that belongs to the UI manager.
@@ -194,6 +317,7 @@ class UIObject(object):
     Attributes:
         name: The unique name of this component. If a component with the same
             name is added to the same parent, the older one will be replaced.
+        manager: The UI this component was added to, if any.
         parent: The component's parent component.
         x:
         y:
@@ -203,14 +327,28 @@ class UIObject(object):
         color:
         alpha:
         surface:
+        hittable: If False, the component is never found at a point, and
+            moving it doesn't rebuild the UI's HitIndex.
     """
     
-    # These won't request redrawing when changed {see UIObject.__setattr__}
-    _quiet_properties = ['surface', 'request_redraw']
+    # Attributes that change how the component is drawn {see UIProperty}
+    x = UIProperty('x', redraw=False, bounds=True)
+    y = UIProperty('y', redraw=False, bounds=True)
+    width = UIProperty('width', bounds=True)
+    height = UIProperty('height', bounds=True)
+    alpha = UIProperty('alpha')
+    
+    manager = None
+    parent = None
+    request_redraw = False
+    hittable = True
+    
+    # True when the surface was rebuilt and children need drawing onto it
+    _compose_children = False
+    _surface_source = None # the texture the surface was scaled from
     
     def __init__(self, **kwargs):
         self.name = 'untitled'
-        self.parent = None
         self.children = []
         
         self.x = 0
@@ -233,44 +371,26 @@ class UIObject(object):
         # This is pretty unrestrictive.. so use with care
         for key, value in kwargs.iteritems():
             setattr(self, key, value)
-    
-    def __setattr__(self, key, value):
-        """Notifies `self.request_redraw` when an object attribute is set.
-        
-        The UI Component polls for redraw requests and updates the surface when
-        a request is made.
-        
-        NOTE: This works - do not modify it (or do so with caution). Messing
-        with __setattr__ can be "dangerous".
-        
-        Replacing __setattr__ removes the need for either a) excessive iteration
-        or b) an excessive amount of properties (virtual attributes) for UI
-        components. UIObject should be used as the base class for all other UI
-        components, allowing __setattr__ to be inherited.
-        
-        See:
-            http://stackoverflow.com/questions/7042152/how-to-i-properly-override-setattr-and-getattribute-on-new-style-classes
-            http://stackoverflow.com/questions/17735520/determine-if-given-class-attribute-is-a-property-or-not-python-object
-        """
-        
-        # If it's not a class property
-        if (key not in self._quiet_properties and hasattr(self, key) and
-                not hasattr(type(self), key)):
-            if getattr(self, key) != value: # no need to redraw if nothing changes
-                object.__setattr__(self, 'request_redraw', True) 
-         
-        object.__setattr__(self, key, value)
+            
+    def redraw(self):
+        """Requests that the component and the parents it's drawn onto are
+        redrawn the next time they're rendered."""
+        self.request_redraw = True
+        if self.parent is not None:
+            self.parent.redraw()
         
     def render(self, surface):
         if self.request_redraw:
             self._update_surface()
             
-        # Draw all children to self
-        for child in self.children:
-            child.render(self.surface)
+        # Draw all children to self, only after our surface was rebuilt
+        if self._compose_children:
+            for child in self.children:
+                child.render(self.surface)
+            self._compose_children = False
             
         # Then draw self..
-        surface.blit(self.surface, (self.x, self.y))
+        return surface.blit(self.surface, (self.x, self.y))
         
     def _update_surface(self):
         if self.width < 1 or self.height < 1:
@@ -278,19 +398,26 @@ class UIObject(object):
         else:
             dims = self.width, self.height
             
-        self.surface = pygame.Surface(dims)
+        # Reuse the old surface if it's the same size and kind
+        old = self.surface
+        reuse = old is not None and old.get_size() == dims
         
         if self.texture is not None:
-            tex = self.texture.copy()
-            tex = pygame.transform.scale(tex, dims)
-            #self.surface.blit(tex, (0, 0))
-            self.surface = tex
+            if reuse and self._surface_source is self.texture:
+                pygame.transform.scale(self.texture, dims, old)
+            else:
+                tex = self.texture.copy()
+                self.surface = pygame.transform.scale(tex, dims)
+            self._surface_source = self.texture
         elif self.color is not None:
-            self.surface = pygame.Surface(dims)
+            if not (reuse and self._surface_source is None):
+                self.surface = pygame.Surface(dims)
             self.surface.fill(self.color)
+            self._surface_source = None
             
         self.surface.set_alpha(self.alpha)
         self.request_redraw = False
+        self._compose_children = True
         
     def on_key_press(self, key=-1):
         pass
@@ -315,6 +442,8 @@ class UIObject(object):
             self.alpha = color[3]
         self._color = color[:3]
         self._update_surface()
+        if self.parent is not None:
+            self.parent.redraw()
         
     @property
     def texture(self):
@@ -325,18 +454,16 @@ class UIObject(object):
             self._texture = pygame.image.load(texture).convert_alpha()
         else:
             self._texture = texture
+        self.redraw()
 
 class Bar(UIObject):
-
-    _quiet_properties = ['_foreground_fill', 'foreground_fill']
-
     """A bar has a border, foreground, and background (three layers)"""
     def __init__(self, **kwargs):
         self._foreground_fill = 1
         
-        self.border = UIObject()
-        self.background = UIObject()
-        self.foreground = UIObject()
+        self.border = UIObject(parent=self)
+        self.background = UIObject(parent=self)
+        self.foreground = UIObject(parent=self)
         
         self.bordercolor = 0, 0, 0
         
@@ -351,6 +478,7 @@ class Bar(UIObject):
         return self._foreground_fill
     @foreground_fill.setter
     def foreground_fill(self, fill):
+        # Only redraws if the foreground's width in pixels changes
         self.foreground.width = int(self.background.width * fill)
         self._foreground_fill = fill
 
@@ -400,31 +528,42 @@ class Bar(UIObject):
         
 class Label(UIObject):
 
+    text = UIProperty('text')
+    font = UIProperty('font')
+    font_size = UIProperty('font_size')
+    
     def __init__(self, **kwargs):
         self.text = "[label]"
         self.font = "default"
         self.font_size = 16
+        self._text_bounds = None
         
         UIObject.__init__(self, **kwargs)
         self._update_surface()
         
     def _update_surface(self):
-        f = pygame.font.Font(fonts[self.font][0], self.font_size)
-        self.surface = f.render(str(self.text), 1, self.color)
+        old_bounds = self._text_bounds
+        self.surface, self._text_bounds = render_text(str(self.text),
+            self.font, self.font_size, self.color)
         self.request_redraw = False
+        
+        # The label's size comes from its text
+        if (self.hittable and self.manager is not None and
+                old_bounds != self._text_bounds):
+            self.manager.invalidate_hit_index()
 
     @property
     def width(self):
-        if self.surface is not None:
-            return self.surface.get_bounding_rect().width
+        if self._text_bounds is not None:
+            return self._text_bounds.width
     @width.setter
     def width(self, width):
         return
         
     @property
     def height(self):
-        if self.surface is not None:
-            return self.surface.get_bounding_rect().height
+        if self._text_bounds is not None:
+            return self._text_bounds.height
     @height.setter
     def height(self, height):
         return
@@ -435,6 +574,8 @@ class Button(UIObject):
         self.selectable = True
         
 class Cursor(UIObject):
+    hittable = False # moves every tick; never the component it clicks
+    
     def __init__(self, **kwargs):
         UIObject.__init__(self, **kwargs)
         self.width = 20
@@ -486,7 +627,7 @@ def load_ui(ini_file, size):
                 if k.endswith('texture'): # load some texture.. needed for Bars
                     attrs[k] = io_utils.get_image(v)
             # Check if there's a texture that matches this component's name
-            if name in io_utils.image_cache:
+            if io_utils.has_image(name):
                 attrs['texture'] = io_utils.get_image(name)
                 
             ui[name] = ctype(**attrs)